@@ -0,0 +1,17 @@
+"""
+Benchmarks for the API. Run them from the repository root, e.g.
+`python -m benchmarks.indexes`; the `src/` modules are importable from here.
+"""
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# The benchmarks run the production profile, which refuses a missing key
+os.environ.setdefault("TOKEN_SECRET", "benchmark key")
+# One log line per request would flood the reports; slow queries still show
+os.environ.setdefault("INSTRUMENTATION_LOG_LEVEL", "WARNING")
+# A single benchmark client would otherwise be throttled like an abusive one
+os.environ.setdefault("RATELIMIT_ENABLED", "0")
@@ -0,0 +1,49 @@
+"""
+Compares two JSON reports written by `benchmarks.load`.
+
+    python -m benchmarks.compare base.json head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent increase reported as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    regressions = 0
+    print(f"base {base.get('commit')}  head {head.get('commit')}")
+    for mode, head_results in head["results"].items():
+        base_results = base["results"].get(mode, {})
+        print(f"\n[{mode}]")
+        for name, row in head_results.items():
+            if name not in base_results:
+                continue
+            for metric in METRICS:
+                before = base_results[name].get(metric)
+                after = row.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before * 100
+                flag = ""
+                if change > args.threshold:
+                    flag = "  REGRESSION"
+                    regressions += 1
+                print(f"{name:<26}{metric:<22}{before:>10.2f}{after:>10.2f}{change:>+9.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Fires identical write requests in parallel and checks their outcome.
+
+The races are the ones of tests/test_concurrency.py (run by pytest on every
+change), here with more clients and rounds and against any database: exactly
+one request of each must succeed, the rest get 409/404 and never a 500, and
+rows and favorite_count must match. Exits non-zero on any failure.
+
+    python -m benchmarks.concurrency --clients 16 --rounds 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SERVER_TIMING", "0")
+    from app import create_app
+    from benchmarks.seed import seed
+    from models import db
+    from tests.test_concurrency import run_races
+
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=database_url)
+    with app.app_context():
+        seed(db.engine, 0, 0, 1, 0)
+
+    started = time.perf_counter()
+    failures = run_races(app, cfg.clients, cfg.rounds)
+    elapsed = time.perf_counter() - started
+    requests = cfg.rounds * cfg.clients * 6
+    print(f"{requests} requests in {elapsed:.1f}s on {database_url.split('://')[0]}, "
+          f"{len(failures)} failures")
+    for failure in failures:
+        print("  " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
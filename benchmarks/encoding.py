@@ -0,0 +1,120 @@
+"""
+Compares JSON encoding paths on the list endpoints.
+
+For /people, /planet and /users it times, per JSON backend (stdlib, orjson
+when installed):
+- orm: the previous path, ORM objects -> serialize() dicts -> provider.dumps
+- rows: column tuples -> precomputed row encoder (what the endpoints use)
+- page / stream: full requests through the test client, walking every page
+  of ?limit=1000 and reading the whole ?stream=json response
+
+    python -m benchmarks.encoding --rows 100000 --repeat 3
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.load import git_commit
+from benchmarks.seed import seed
+
+ENDPOINTS = (("/people", "people"), ("/planet", "planet"), ("/users", "user"))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def orm_path(provider, model):
+    from sqlalchemy import select
+    from models import db
+    rows = db.session.execute(select(model).order_by(model.id)).scalars().all()
+    body = provider.dumps([row.serialize() for row in rows])
+    db.session.expunge_all()
+    return body
+
+
+def rows_path(provider, model):
+    from pagination import iter_rows
+    encode = provider.row_encoder(model.SUMMARY_FIELDS)
+    return b"[" + b",".join([encode(row) for row in iter_rows(model)]) + b"]"
+
+
+def walk_pages(client, path, table):
+    from models import db
+    from versions import bump_versions
+    # A new version stamp makes every cached page miss
+    bump_versions([table])
+    db.session.commit()
+    url = f"{path}?limit=1000"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        cursor = response.get_json()["next_cursor"]
+        url = f"{path}?limit=1000&after={cursor}" if cursor is not None else None
+
+
+def read_stream(client, path):
+    response = client.get(f"{path}?stream=json")
+    assert response.status_code == 200, response.status_code
+    response.get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--rows", type=int, default=100000, help="rows per table")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output")
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SERVER_TIMING", "0")
+    from app import app
+    from encoding import OrjsonProvider, StdlibJSONProvider, orjson
+    from models import db, People, Planets, User
+    models = {"/people": People, "/planet": Planets, "/users": User}
+    providers = [StdlibJSONProvider(app)] + ([OrjsonProvider(app)] if orjson else [])
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split("://")[0],
+        "rows": cfg.rows,
+        "results": {}
+    }
+    with app.app_context():
+        seed(db.engine, cfg.rows, cfg.rows, cfg.rows, 0)
+        client = app.test_client()
+        for provider in providers:
+            app.json = provider
+            for path, table in ENDPOINTS:
+                model = models[path]
+                report["results"][f"{provider.name} {path}"] = {
+                    "orm_ms": timed(lambda: orm_path(provider, model), cfg.repeat),
+                    "rows_ms": timed(lambda: rows_path(provider, model), cfg.repeat),
+                    "pages_ms": timed(lambda: walk_pages(client, path, table), cfg.repeat),
+                    "stream_ms": timed(lambda: read_stream(client, path), cfg.repeat),
+                }
+
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"{'backend / endpoint':<20}{'orm ms':>10}{'rows ms':>10}{'pages ms':>10}"
+          f"{'stream ms':>11}")
+    for name, row in report["results"].items():
+        print(f"{name:<20}{row['orm_ms']:>10.1f}{row['rows_ms']:>10.1f}"
+              f"{row['pages_ms']:>10.1f}{row['stream_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
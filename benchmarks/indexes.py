@@ -0,0 +1,86 @@
+"""
+Lookup cost of the hot filter columns with and without their indexes.
+
+    python -m benchmarks.indexes --people 200000 --users 20000 --lookups 500
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine, select
+from models import User, People, Planets, Favorite_people, Favorite_planets
+from benchmarks.seed import seed
+
+INDEXED_TABLES = [User, People, Planets, Favorite_people, Favorite_planets]
+
+
+def lookups(engine, args):
+    rng = random.Random(7)
+    queries = {
+        "people_by_name": lambda: select(People.id).where(
+            People.name == f"person-{rng.randrange(args.people)}"),
+        "planet_by_name": lambda: select(Planets.id).where(
+            Planets.name == f"planet-{rng.randrange(args.planets)}"),
+        "user_by_username": lambda: select(User.id).where(
+            User.username == f"user-{rng.randrange(args.users)}"),
+        "who_favorited_person": lambda: select(Favorite_people.user_id).where(
+            Favorite_people.people_id == rng.randrange(1, args.people + 1)),
+        "who_favorited_planet": lambda: select(Favorite_planets.user_id).where(
+            Favorite_planets.planet_id == rng.randrange(1, args.planets + 1)),
+    }
+    results = {}
+    with engine.connect() as conn:
+        for name, make_query in queries.items():
+            started = time.perf_counter()
+            for _ in range(args.lookups):
+                conn.execute(make_query()).all()
+            elapsed = time.perf_counter() - started
+            results[name] = elapsed / args.lookups * 1000
+    return results
+
+
+def run(args, with_indexes):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    seed(engine, args.people, args.planets, args.users, args.favorites)
+    if not with_indexes:
+        with engine.begin() as conn:
+            for model in INDEXED_TABLES:
+                for index in model.__table__.indexes:
+                    index.drop(conn)
+    try:
+        return lookups(engine, args)
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--planets", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--favorites", type=int, default=10,
+                        help="favorites of each kind per user")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    args = parser.parse_args()
+
+    before = run(args, with_indexes=False)
+    after = run(args, with_indexes=True)
+    report = {name: {"without_index_ms": before[name], "with_index_ms": after[name]}
+              for name in before}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'lookup':<24}{'no index (ms)':>16}{'index (ms)':>14}{'speedup':>10}")
+    for name, row in report.items():
+        speedup = row["without_index_ms"] / row["with_index_ms"] if row["with_index_ms"] else 0
+        print(f"{name:<24}{row['without_index_ms']:>16.3f}{row['with_index_ms']:>14.3f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
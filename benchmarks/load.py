@@ -0,0 +1,226 @@
+"""
+Latency/throughput benchmark for every route in src/app.py.
+
+Seeds a database, then drives each scenario through the Flask test client and,
+optionally, through a real gunicorn worker over HTTP. Reports p50/p95/p99
+latency, requests per second and SQL queries per request (read from the
+Server-Timing header over HTTP), and writes the results as JSON so runs from
+different commits can be compared with `python -m benchmarks.compare`.
+
+    python -m benchmarks.load --people 100000 --requests 200 --mode both -o bench.json
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from sqlalchemy import event
+from benchmarks import SRC_DIR
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.seed import seed
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed, queries=None):
+    ordered = sorted(latencies)
+    result = {
+        "requests": len(latencies),
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "rps": len(latencies) / elapsed if elapsed else None,
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "queries_per_request": None
+    }
+    if queries is not None:
+        result["queries_per_request"] = sum(queries) / len(queries)
+    return result
+
+
+def failed_scenarios(results):
+    """Scenarios that got any non-2xx answer, so an error path is never reported as a timing"""
+    return {name: row["statuses"] for name, row in results.items()
+            if any(not code.startswith("2") for code in row["statuses"])}
+
+
+def selected(names):
+    if not names:
+        return SCENARIOS
+    wanted = set(names.split(","))
+    return [scenario for scenario in SCENARIOS if scenario[0] in wanted]
+
+
+def run_client(cfg, app, db):
+    with app.app_context():
+        engine = db.engine
+        seed(engine, cfg.people, cfg.planets, cfg.users, cfg.favorites)
+
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    client = app.test_client()
+    results = {}
+    try:
+        for name, make_request in selected(cfg.scenarios):
+            latencies, statuses, queries = [], [], []
+            started = time.perf_counter()
+            for i in range(cfg.requests):
+                method, path, body = make_request(i, cfg)
+                counter[0] = 0
+                t0 = time.perf_counter()
+                response = client.open(path, method=method, json=body)
+                response.get_data()
+                latencies.append(time.perf_counter() - t0)
+                statuses.append(response.status_code)
+                queries.append(counter[0])
+            results[name] = summarize(latencies, statuses,
+                                      time.perf_counter() - started, queries)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run_gunicorn(cfg, app, db, env):
+    with app.app_context():
+        seed(db.engine, cfg.people, cfg.planets, cfg.users, cfg.favorites)
+
+    port = _free_port()
+    command = [sys.executable, "-m", "gunicorn", "wsgi", "--chdir", SRC_DIR,
+               "-b", f"127.0.0.1:{port}"] + cfg.gunicorn_args.split()
+    server = subprocess.Popen(command, env=env)
+    results = {}
+    try:
+        _wait_for(port)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        # Warm-up, so the first scenario does not pay for the worker's lazy imports
+        conn.request("GET", "/")
+        conn.getresponse().read()
+        for name, make_request in selected(cfg.scenarios):
+            latencies, statuses, queries = [], [], []
+            started = time.perf_counter()
+            for i in range(cfg.requests):
+                method, path, body = make_request(i, cfg)
+                payload = json.dumps(body) if body is not None else None
+                headers = {"Content-Type": "application/json"} if payload else {}
+                t0 = time.perf_counter()
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                latencies.append(time.perf_counter() - t0)
+                statuses.append(response.status)
+                # Query counts come from the app's Server-Timing header
+                match = SERVER_TIMING_QUERIES.search(response.getheader("Server-Timing") or "")
+                if match:
+                    queries.append(int(match.group(1)))
+            results[name] = summarize(latencies, statuses, time.perf_counter() - started,
+                                      queries if len(queries) == len(latencies) else None)
+        conn.close()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(SRC_DIR),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url",
+                        help="defaults to a temporary SQLite file; use a local "
+                             "PostgreSQL URL to benchmark against Postgres")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--planets", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--favorites", type=int, default=10,
+                        help="favorites of each kind per user")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per scenario")
+    parser.add_argument("--scenarios", help="comma separated subset of scenarios")
+    parser.add_argument("--mode", choices=("client", "gunicorn", "both"), default="client")
+    parser.add_argument("--gunicorn-args", default="-w 1",
+                        help="extra arguments for the gunicorn worker")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    from app import app
+    from models import db
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split("://")[0],
+        "config": {key: getattr(cfg, key) for key in
+                   ("people", "planets", "users", "favorites", "requests", "gunicorn_args")},
+        "results": {}
+    }
+    if cfg.mode in ("client", "both"):
+        report["results"]["client"] = run_client(cfg, app, db)
+    if cfg.mode in ("gunicorn", "both"):
+        report["results"]["gunicorn"] = run_gunicorn(cfg, app, db, dict(os.environ))
+
+    output = json.dumps(report, indent=2)
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            f.write(output)
+    for mode, results in report["results"].items():
+        print(f"\n[{mode}]")
+        print(f"{'scenario':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rps':>9}{'sql/req':>9}")
+        for name, row in results.items():
+            sql = row["queries_per_request"]
+            print(f"{name:<26}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                  f"{row['rps']:>9.0f}{'-' if sql is None else format(sql, '.1f'):>9}")
+
+    failures = {mode: failed_scenarios(results) for mode, results in report["results"].items()}
+    failures = {mode: failed for mode, failed in failures.items() if failed}
+    for mode, failed in failures.items():
+        for name, statuses in failed.items():
+            print(f"FAILED [{mode}] {name}: statuses {statuses}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
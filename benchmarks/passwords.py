@@ -0,0 +1,128 @@
+"""
+Signup and login throughput per password hashing setting.
+
+For every method (and pool size) it drives POST /user and POST /login from
+concurrent in-process clients and reports requests per second, plus the p50
+of GET /people/1 measured while the logins run, to show what hashing costs
+the rest of the API.
+
+    python -m benchmarks.passwords --clients 8 --requests 200 \
+        --methods pbkdf2:sha256:600000,scrypt:32768:8:1,argon2 --threads 1,2,4
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+from benchmarks.load import git_commit, summarize
+from benchmarks.seed import seed
+
+
+def run_clients(app, clients, requests, make_request):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def client(n):
+        http = app.test_client()
+        local_latencies, local_statuses = [], []
+        for i in range(n, requests, clients):
+            t0 = time.perf_counter()
+            response = make_request(http, i)
+            local_latencies.append(time.perf_counter() - t0)
+            local_statuses.append(response.status_code)
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.extend(local_statuses)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def read_latency_during(app, stop):
+    http = app.test_client()
+    latencies, statuses = [], []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        statuses.append(http.get("/people/1", headers={"Cache-Control": "no-cache"}).status_code)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, statuses
+
+
+def bench(app, method, threads, cfg, run):
+    from passwords import Hasher
+    app.extensions["password_hasher"] = Hasher(
+        method, threads, queue=cfg.clients, timeout=120)
+    prefix = f"{run}-"
+
+    signup = run_clients(app, cfg.clients, cfg.requests, lambda http, i: http.post(
+        "/user", json={"username": f"{prefix}{i}", "email": f"{prefix}{i}@example.com",
+                       "password": f"secret-{i}"}))
+
+    stop = threading.Event()
+    reads = {}
+    reader = threading.Thread(target=lambda: reads.update(
+        zip(("latencies", "statuses"), read_latency_during(app, stop))))
+    reader.start()
+    login = run_clients(app, cfg.clients, cfg.requests, lambda http, i: http.post(
+        "/login", json={"username": f"{prefix}{i}", "password": f"secret-{i}"}))
+    stop.set()
+    reader.join()
+    during = summarize(reads["latencies"], reads["statuses"], 1)
+    return {"signup": signup, "login": login, "read_p50_ms_during_login": during["p50_ms"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="signups and logins per run")
+    parser.add_argument("--methods", default="pbkdf2:sha256:600000,scrypt:32768:8:1,argon2")
+    parser.add_argument("--threads", default="1,2,4", help="hashing pool sizes")
+    parser.add_argument("-o", "--output")
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SERVER_TIMING", "0")
+    from app import app
+    from models import db
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split("://")[0],
+        "config": {"clients": cfg.clients, "requests": cfg.requests},
+        "results": {}
+    }
+    with app.app_context():
+        seed(db.engine, 100, 10, 0, 0)
+    run = 0
+    for method in cfg.methods.split(","):
+        if method == "argon2" and importlib.util.find_spec("argon2") is None:
+            print("skipping argon2: argon2-cffi is not installed")
+            continue
+        for threads in [int(value) for value in cfg.threads.split(",")]:
+            run += 1
+            report["results"][f"{method} x{threads}"] = bench(app, method, threads, cfg, run)
+
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"{'method / pool':<28}{'signup rps':>11}{'login rps':>11}{'login p95':>11}"
+          f"{'read p50':>10}")
+    for name, row in report["results"].items():
+        print(f"{name:<28}{row['signup']['rps']:>11.1f}{row['login']['rps']:>11.1f}"
+              f"{row['login']['p95_ms']:>11.1f}{row['read_p50_ms_during_login']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
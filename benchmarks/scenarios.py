@@ -0,0 +1,59 @@
+"""
+One scenario per route. Each `request(i, cfg)` returns (method, path, json)
+for iteration `i`; write scenarios generate ids that do not collide with the
+seed or with earlier iterations, and paired scenarios (add then remove a
+favorite, create then delete a user) run in that order. Every request must
+succeed: a scenario that gets a non-2xx answer fails the run.
+"""
+from benchmarks.seed import favorite_target
+
+
+def _user(i, cfg):
+    return i % cfg.users + 1
+
+
+def _fresh_target(i, cfg, size):
+    # One past the seeded favorites of this user, shifted on each pass over the users
+    user_id = _user(i, cfg)
+    return favorite_target(user_id, cfg.favorites + i // cfg.users, size)
+
+
+SCENARIOS = [
+    ("sitemap", lambda i, cfg: ("GET", "/", None)),
+    ("users_list", lambda i, cfg: ("GET", "/users", None)),
+    ("people_list", lambda i, cfg: ("GET", "/people", None)),
+    ("people_list_page", lambda i, cfg: (
+        "GET", f"/people?limit=50&after={i * 50 % cfg.people}", None)),
+    ("people_detail", lambda i, cfg: ("GET", f"/people/{i % cfg.people + 1}", None)),
+    ("planet_list", lambda i, cfg: ("GET", "/planet", None)),
+    ("planet_detail", lambda i, cfg: ("GET", f"/planet/{i % cfg.planets + 1}", None)),
+    ("user_favorites", lambda i, cfg: ("GET", f"/user/{_user(i, cfg)}/favorites", None)),
+    ("create_person", lambda i, cfg: ("POST", "/people", {"name": f"bench-person-{i}"})),
+    ("create_planet", lambda i, cfg: ("POST", "/planets", {"name": f"bench-planet-{i}"})),
+    ("people_bulk", lambda i, cfg: ("POST", "/people/bulk", [
+        {"name": f"bench-bulk-{i}-{j}"} for j in range(50)])),
+    ("planets_bulk", lambda i, cfg: ("POST", "/planets/bulk", [
+        {"name": f"bench-bulk-{i}-{j}"} for j in range(50)])),
+    ("create_favorite_people", lambda i, cfg: (
+        "POST", f"/{_user(i, cfg)}/favoritePeople/{_fresh_target(i, cfg, cfg.people)}", None)),
+    ("delete_favorite_people", lambda i, cfg: (
+        "DELETE", f"/{_user(i, cfg)}/favoritePeople/{_fresh_target(i, cfg, cfg.people)}", None)),
+    ("create_favorite_planet", lambda i, cfg: (
+        "POST", f"/{_user(i, cfg)}/favoritePlanet/{_fresh_target(i, cfg, cfg.planets)}", None)),
+    ("delete_favorite_planet", lambda i, cfg: (
+        "DELETE", f"/{_user(i, cfg)}/favoritePlanet/{_fresh_target(i, cfg, cfg.planets)}", None)),
+    ("patch_favorites", lambda i, cfg: (
+        "PATCH", f"/user/{_user(i, cfg)}/favorites",
+        {"add": {"people": [_fresh_target(i, cfg, cfg.people)]},
+         "remove": {"planets": [favorite_target(_user(i, cfg), 0, cfg.planets)]}})),
+    ("replace_favorites", lambda i, cfg: (
+        "PUT", f"/user/{_user(i, cfg)}/favorites",
+        {"people": [favorite_target(_user(i, cfg), j, cfg.people)
+                    for j in range(cfg.favorites)],
+         "planets": [favorite_target(_user(i, cfg), j, cfg.planets)
+                     for j in range(cfg.favorites)]})),
+    ("create_user", lambda i, cfg: ("POST", "/user", {
+        "username": f"bench-user-{i}", "email": f"bench-user-{i}@example.com",
+        "password": "x"})),
+    ("delete_user", lambda i, cfg: ("DELETE", f"/user/{cfg.users + 1 + i}", None)),
+]
@@ -0,0 +1,57 @@
+"""
+Deterministic seed data for the benchmarks.
+
+User `u` favorites people/planets `u*k + j` (mod table size) for `j < k`, so
+scenarios can compute ids that are known to be, or not to be, favorites.
+"""
+from sqlalchemy import func, insert, select, update
+from models import db, User, People, Planets, Favorite_people, Favorite_planets, TableVersion
+
+CHUNK = 10000
+
+
+def favorite_target(user_id, j, size):
+    return (user_id * 7919 + j) % size + 1
+
+
+def _insert(conn, model, rows):
+    for start in range(0, len(rows), CHUNK):
+        conn.execute(insert(model), rows[start:start + CHUNK])
+
+
+def reset(engine):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+
+
+def seed(engine, people, planets, users, favorites):
+    reset(engine)
+    with engine.begin() as conn:
+        _insert(conn, People, [
+            {"name": f"person-{i}", "height": 150 + i % 60, "mass": 50 + i % 80,
+             "gender": ("male", "female", "n/a")[i % 3]} for i in range(people)])
+        _insert(conn, Planets, [
+            {"name": f"planet-{i}", "climate": ("arid", "temperate", "frozen")[i % 3],
+             "terrain": ("desert", "forest", "tundra")[i % 3],
+             "population": i * 1000} for i in range(planets)])
+        _insert(conn, User, [
+            {"username": f"user-{i}", "email": f"user-{i}@example.com",
+             "password": "x", "is_active": True} for i in range(users)])
+        fav_people = []
+        fav_planets = []
+        for user_id in range(1, users + 1):
+            for j in range(min(favorites, people)):
+                fav_people.append(
+                    {"user_id": user_id, "people_id": favorite_target(user_id, j, people)})
+            for j in range(min(favorites, planets)):
+                fav_planets.append(
+                    {"user_id": user_id, "planet_id": favorite_target(user_id, j, planets)})
+        _insert(conn, Favorite_people, fav_people)
+        _insert(conn, Favorite_planets, fav_planets)
+        for model, favorite_model, column in ((People, Favorite_people, "people_id"),
+                                              (Planets, Favorite_planets, "planet_id")):
+            conn.execute(update(model).values(favorite_count=select(func.count()).select_from(
+                favorite_model).where(getattr(favorite_model, column) == model.id)
+                .scalar_subquery()))
+        _insert(conn, TableVersion, [
+            {"name": name, "version": 0} for name in ("user", "people", "planet")])
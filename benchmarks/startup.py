@@ -0,0 +1,128 @@
+"""
+Cold start per app profile: import, create_app() and the first request.
+
+Every run is a fresh interpreter (what a scale-to-zero instance or a
+non-preloaded gunicorn worker pays), timed from the first import of the app
+module to the end of the first GET. The medians over --runs are reported,
+plus the modules that took longest to import in the last run.
+
+    python -m benchmarks.startup --profiles production,api --runs 10 --path /people/1
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from benchmarks import SRC_DIR
+from benchmarks.load import git_commit
+from benchmarks.seed import seed
+
+PHASES = ("import_ms", "create_ms", "first_request_ms", "second_request_ms", "total_ms")
+
+# Runs inside the child interpreter, with src/ as the working directory
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app(sys.argv[1])
+t2 = time.perf_counter()
+client = app.test_client()
+status = client.get(sys.argv[2]).status_code
+t3 = time.perf_counter()
+client.get(sys.argv[2], headers={"Cache-Control": "no-cache"})
+t4 = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (t1 - t0) * 1000,
+    "create_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "second_request_ms": (t4 - t3) * 1000,
+    "total_ms": (t3 - t0) * 1000,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def run_once(profile, path, env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    result = subprocess.run(command + ["-c", CHILD, profile, path], cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    if importtime:
+        sample["slowest_imports"] = slowest_imports(result.stderr)
+    return sample
+
+
+def slowest_imports(stderr, top=8):
+    """Modules imported by app.py, by cumulative time, from `-X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # One space plus two per nesting level: app.py's own imports are at 3
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in sorted(rows, reverse=True)[:top]]
+
+
+def bench(profile, cfg, env):
+    samples = [run_once(profile, cfg.path, env) for _ in range(cfg.runs - 1)]
+    samples.append(run_once(profile, cfg.path, env, importtime=True))
+    row = {phase: round(statistics.median(s[phase] for s in samples), 1) for phase in PHASES}
+    row["status"] = samples[-1]["status"]
+    row["modules"] = samples[-1]["modules"]
+    row["slowest_imports"] = samples[-1]["slowest_imports"]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--profiles", default="production,api")
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes per profile")
+    parser.add_argument("--path", default="/people/1", help="the first request")
+    parser.add_argument("-o", "--output")
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    from app import create_app
+    from models import db
+    with create_app("testing", SQLALCHEMY_DATABASE_URI=database_url).app_context():
+        seed(db.engine, 100, 10, 10, 2)
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split("://")[0],
+        "config": {"runs": cfg.runs, "path": cfg.path},
+        "results": {}
+    }
+    env = dict(os.environ)
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    for profile in cfg.profiles.split(","):
+        report["results"][profile] = bench(profile, cfg, env)
+
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"{'profile':<14}" + "".join(f"{phase[:-3]:>16}" for phase in PHASES)
+          + f"{'modules':>9}")
+    for profile, row in report["results"].items():
+        print(f"{profile:<14}" + "".join(f"{row[phase]:>16.1f}" for phase in PHASES)
+              + f"{row['modules']:>9}")
+    for profile, row in report["results"].items():
+        slowest = ", ".join(f"{item['module']} {item['ms']:.0f}" for item in row["slowest_imports"])
+        print(f"{profile}: {slowest}")
+
+
+if __name__ == "__main__":
+    main()
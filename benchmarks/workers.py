@@ -0,0 +1,141 @@
+"""
+Compares gunicorn worker modes (sync, gthread, gevent) on the read endpoints.
+
+Each mode is started with the shipped gunicorn.conf.py and hit by concurrent
+HTTP clients for a fixed duration; modes whose worker class is not installed
+are skipped.
+
+    python -m benchmarks.workers --workers 2 --clients 16 --duration 10
+"""
+import argparse
+import datetime
+import http.client
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from benchmarks import SRC_DIR
+from benchmarks.load import _free_port, _wait_for, git_commit, summarize
+from benchmarks.seed import seed
+
+ROOT_DIR = os.path.dirname(SRC_DIR)
+MODES = {
+    "sync": None,
+    "gthread": None,
+    "gevent": "gevent",
+}
+
+
+def read_paths(cfg):
+    return [
+        "/people?limit=100",
+        "/planet?limit=100",
+        "/users?limit=100",
+        f"/people/{cfg.people // 2}",
+        f"/planet/{cfg.planets // 2}",
+        f"/user/{cfg.users // 2}/favorites",
+    ]
+
+
+def drive(port, paths, clients, duration):
+    latencies, statuses = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local_latencies, local_statuses = [], []
+        i = offset
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            conn.request("GET", paths[i % len(paths)])
+            response = conn.getresponse()
+            response.read()
+            local_latencies.append(time.perf_counter() - t0)
+            local_statuses.append(response.status)
+            i += 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.extend(local_statuses)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def run_mode(mode, cfg, env):
+    port = _free_port()
+    env = dict(env, GUNICORN_WORKER_CLASS=mode, WEB_CONCURRENCY=str(cfg.workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}")
+    if cfg.threads:
+        env["GUNICORN_THREADS"] = str(cfg.threads)
+    command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT_DIR, "gunicorn.conf.py"),
+               "wsgi", "--chdir", SRC_DIR]
+    server = subprocess.Popen(command, env=env, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for(port)
+        drive(port, ["/"], 1, 0.5)
+        return drive(port, read_paths(cfg), cfg.clients, cfg.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--planets", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--favorites", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, help="threads per gthread worker")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per mode")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("-o", "--output")
+    cfg = parser.parse_args()
+
+    database_url = cfg.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    from app import app
+    from models import db
+    with app.app_context():
+        seed(db.engine, cfg.people, cfg.planets, cfg.users, cfg.favorites)
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.datetime.utcnow().isoformat() + "Z",
+        "database": database_url.split("://")[0],
+        "config": {key: getattr(cfg, key) for key in
+                   ("workers", "threads", "clients", "duration")},
+        "results": {}
+    }
+    for mode in cfg.modes.split(","):
+        module = MODES[mode]
+        if module and importlib.util.find_spec(module) is None:
+            print(f"skipping {mode}: {module} is not installed")
+            continue
+        report["results"][mode] = run_mode(mode, cfg, dict(os.environ))
+
+    if cfg.output:
+        with open(cfg.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rps':>9}")
+    for mode, row in report["results"].items():
+        print(f"{mode:<10}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['rps']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Gunicorn settings, read with `gunicorn -c gunicorn.conf.py wsgi --chdir ./src/`.
+
+GUNICORN_WORKER_CLASS picks the concurrency model:
+- sync (default): one request per worker process
+- gthread: GUNICORN_THREADS threads per worker
+- gevent: GUNICORN_WORKER_CONNECTIONS greenlets per worker (needs gevent,
+  and psycogreen when running on PostgreSQL)
+
+Sessions are safe under all three: Flask-SQLAlchemy scopes db.session to the
+app context, which is per thread/greenlet, and the pool is sized to the
+per-worker concurrency unless DB_POOL_SIZE is set explicitly.
+
+Worker counts derive from the CPUs this container may use (affinity mask and
+cgroup quota), not the host's cores. DB_MAX_CONNECTIONS, when set, is the
+database connection budget of the whole server: every worker's pool plus
+overflow is capped so that workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) fits.
+"""
+import math
+import os
+
+
+def available_cpus():
+    """CPUs usable by this process: the affinity mask, capped by a cgroup CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+cpu_count = available_cpus()
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+
+if worker_class == "gevent":
+    # Must happen before the app (and its locks/sockets) is imported by preload
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+if worker_class == "sync":
+    default_workers = cpu_count * 2 + 1
+else:
+    default_workers = cpu_count + 1
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers))
+
+threads = int(os.getenv("GUNICORN_THREADS", cpu_count * 2 if worker_class == "gthread" else 1))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+
+# One pooled connection per concurrent request inside a worker; a sync
+# worker serves one request at a time, so one connection plus a spare
+if worker_class == "gthread":
+    os.environ.setdefault("DB_POOL_SIZE", str(threads))
+elif worker_class == "gevent":
+    os.environ.setdefault("DB_POOL_SIZE", str(min(worker_connections, 20)))
+else:
+    os.environ.setdefault("DB_POOL_SIZE", "1")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "1")
+
+max_connections = int(os.getenv("DB_MAX_CONNECTIONS", 0))
+if max_connections and os.getenv("DB_PGBOUNCER", "0") not in ("1", "true", "True"):
+    per_worker = max_connections // workers
+    if per_worker < 1:
+        raise RuntimeError(f"DB_MAX_CONNECTIONS={max_connections} is less than one "
+                           f"connection for each of the {workers} workers")
+    pool_size = min(int(os.getenv("DB_POOL_SIZE", 5)), per_worker)
+    max_overflow = min(int(os.getenv("DB_MAX_OVERFLOW", 10)), per_worker - pool_size)
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+
+# Load the app once in the master so forked workers share its memory pages
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") not in ("0", "false", "False")
+
+# Recycle workers gradually to contain leaks without restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+
+def post_fork(server, worker):
+    # Connections opened in the master during preload must not be shared
+    # across processes; each worker starts with an empty pool
+    from app import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
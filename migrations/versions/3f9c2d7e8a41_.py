@@ -0,0 +1,34 @@
+"""table_version stamps for conditional GETs
+
+Revision ID: 3f9c2d7e8a41
+Revises: 1bd99a338a1d
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7e8a41'
+down_revision = '1bd99a338a1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_version = op.create_table('table_version',
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_version, [
+        {'name': 'user', 'version': 0, 'updated_at': None},
+        {'name': 'people', 'version': 0, 'updated_at': None},
+        {'name': 'planet', 'version': 0, 'updated_at': None},
+    ])
+
+
+def downgrade():
+    op.drop_table('table_version')
@@ -0,0 +1,32 @@
+"""widen user.password to hold password hashes
+
+Revision ID: 5d8e2b7a9c16
+Revises: f2a7c3e9b154
+Create Date: 2026-10-18 12:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2b7a9c16'
+down_revision = 'f2a7c3e9b154'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password',
+                              existing_type=sa.String(length=80),
+                              type_=sa.String(length=255),
+                              existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password',
+                              existing_type=sa.String(length=255),
+                              type_=sa.String(length=80),
+                              existing_nullable=False)
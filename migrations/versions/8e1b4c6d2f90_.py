@@ -0,0 +1,82 @@
+"""indexes on hot lookup columns
+
+Revision ID: 8e1b4c6d2f90
+Revises: 3f9c2d7e8a41
+Create Date: 2026-10-18 09:45:00.000000
+
+user.username, people.name and planet.name become unique. Databases created
+before this revision may hold duplicates; the upgrade lists them and stops
+before creating any index, so they can be merged or renamed by hand (rows
+are referenced by favorites, so they are not deleted here).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1b4c6d2f90'
+down_revision = '3f9c2d7e8a41'
+branch_labels = None
+depends_on = None
+
+UNIQUE_COLUMNS = (('user', 'username'), ('people', 'name'), ('planet', 'name'))
+# Duplicated values quoted per column in the error
+SHOWN_DUPLICATES = 20
+
+
+def _check_duplicates():
+    bind = op.get_bind()
+    problems = []
+    for table, column in UNIQUE_COLUMNS:
+        value = sa.column(column)
+        rows = bind.execute(
+            sa.select(value, sa.func.count().label('copies'))
+            .select_from(sa.table(table, value))
+            .group_by(value)
+            .having(sa.func.count() > 1)
+            .order_by(value)
+        ).all()
+        if rows:
+            shown = ', '.join(f'{row[0]!r} x{row[1]}' for row in rows[:SHOWN_DUPLICATES])
+            more = f' and {len(rows) - SHOWN_DUPLICATES} more' if len(rows) > SHOWN_DUPLICATES else ''
+            problems.append(f'{table}.{column}: {len(rows)} duplicated values ({shown}{more})')
+    if problems:
+        raise RuntimeError(
+            'Cannot create the unique indexes, remove or rename the duplicates first:\n  '
+            + '\n  '.join(problems))
+
+
+def upgrade():
+    _check_duplicates()
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_username', ['username'], unique=True)
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.create_index('ix_people_name', ['name'], unique=True)
+
+    with op.batch_alter_table('planet', schema=None) as batch_op:
+        batch_op.create_index('ix_planet_name', ['name'], unique=True)
+
+    with op.batch_alter_table('favorite_people', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_people_people_id', ['people_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('favorite_planets', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_planets_planet_id', ['planet_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('favorite_planets', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_planets_planet_id')
+
+    with op.batch_alter_table('favorite_people', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_people_people_id')
+
+    with op.batch_alter_table('planet', schema=None) as batch_op:
+        batch_op.drop_index('ix_planet_name')
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.drop_index('ix_people_name')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_username')
@@ -0,0 +1,51 @@
+"""re-index people/planet in FTS5 only when a searchable column changes
+
+Revision ID: 9b3e6f1a4c27
+Revises: 5d8e2b7a9c16
+Create Date: 2026-10-18 14:20:00.000000
+
+The update triggers of c47d91e5ab03 fired on every UPDATE, so each favorite
+added or removed (favorite_count) rewrote the row's FTS5 entry. They are
+recreated as AFTER UPDATE OF the searched columns.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e6f1a4c27'
+down_revision = '5d8e2b7a9c16'
+branch_labels = None
+depends_on = None
+
+SEARCH_FIELDS = {
+    'people': ['name', 'gender', 'eye_color', 'hair_color', 'skin_color', 'birth_year'],
+    'planet': ['name', 'climate', 'terrain', 'gravity'],
+}
+
+
+def _recreate_update_triggers(of_columns):
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    inspector = sa.inspect(bind)
+    for table, fields in SEARCH_FIELDS.items():
+        if not inspector.has_table(f'{table}_fts'):
+            continue
+        columns = ', '.join(fields)
+        new_values = ', '.join(f'new.{field}' for field in fields)
+        old_values = ', '.join(f'old.{field}' for field in fields)
+        event = f"UPDATE OF {columns}" if of_columns else "UPDATE"
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_au")
+        op.execute(f"""CREATE TRIGGER {table}_fts_au AFTER {event} ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_values});
+        END""")
+
+
+def upgrade():
+    _recreate_update_triggers(of_columns=True)
+
+
+def downgrade():
+    _recreate_update_triggers(of_columns=False)
@@ -0,0 +1,72 @@
+"""full-text search indexes for people and planet
+
+Revision ID: c47d91e5ab03
+Revises: 8e1b4c6d2f90
+Create Date: 2026-10-18 10:30:00.000000
+
+On PostgreSQL: GIN indexes over the same to_tsvector expression that
+src/search.py queries. On SQLite (when built with FTS5): external-content
+FTS5 tables kept in sync with triggers. Other dialects fall back to the
+in-process index and need nothing here.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d91e5ab03'
+down_revision = '8e1b4c6d2f90'
+branch_labels = None
+depends_on = None
+
+SEARCH_FIELDS = {
+    'people': ['name', 'gender', 'eye_color', 'hair_color', 'skin_color', 'birth_year'],
+    'planet': ['name', 'climate', 'terrain', 'gravity'],
+}
+
+
+def _document(fields):
+    joined = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+    return f"to_tsvector('simple', {joined})"
+
+
+def _sqlite_has_fts5(bind):
+    return bool(bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table, fields in SEARCH_FIELDS.items():
+            op.execute(f"CREATE INDEX ix_{table}_search ON {table} USING gin (({_document(fields)}))")
+
+    elif bind.dialect.name == 'sqlite' and _sqlite_has_fts5(bind):
+        for table, fields in SEARCH_FIELDS.items():
+            columns = ', '.join(fields)
+            new_values = ', '.join(f'new.{field}' for field in fields)
+            old_values = ', '.join(f'old.{field}' for field in fields)
+            op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5({columns}, content='{table}', content_rowid='id')")
+            op.execute(f"""CREATE TRIGGER {table}_fts_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+            op.execute(f"""CREATE TRIGGER {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END""")
+            op.execute(f"""CREATE TRIGGER {table}_fts_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table in SEARCH_FIELDS:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
+
+    elif bind.dialect.name == 'sqlite':
+        for table in SEARCH_FIELDS:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
@@ -0,0 +1,34 @@
+"""shared_entry table for token revocations and idempotency keys
+
+Revision ID: d61f0a8b3e52
+Revises: 9b3e6f1a4c27
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd61f0a8b3e52'
+down_revision = '9b3e6f1a4c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shared_entry',
+    sa.Column('key', sa.String(length=512), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('shared_entry', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_shared_entry_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shared_entry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_shared_entry_expires_at'))
+
+    op.drop_table('shared_entry')
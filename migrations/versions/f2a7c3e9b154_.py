@@ -0,0 +1,40 @@
+"""favorite_count counters on people and planet
+
+Revision ID: f2a7c3e9b154
+Revises: c47d91e5ab03
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c3e9b154'
+down_revision = 'c47d91e5ab03'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    ('people', 'favorite_people', 'people_id'),
+    ('planet', 'favorite_planets', 'planet_id'),
+)
+
+
+def upgrade():
+    for table, favorite_table, column in COUNTERS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'favorite_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.create_index(f'ix_{table}_favorite_count', ['favorite_count', 'id'],
+                                  unique=False)
+        op.execute(
+            f'UPDATE {table} SET favorite_count = (SELECT count(*) FROM {favorite_table} '
+            f'WHERE {favorite_table}.{column} = {table}.id)')
+
+
+def downgrade():
+    for table, _, _ in reversed(COUNTERS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_favorite_count')
+            batch_op.drop_column('favorite_count')
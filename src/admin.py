@@ -1,7 +1,210 @@
 import os
+from flask import current_app
 from flask_admin import Admin
 from models import db, User, People, Favorite_people, Planets, Favorite_planets
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import and_, false, or_, text
+from wtforms import PasswordField
+from wtforms.validators import ValidationError
+from favorites import adjust_favorite_counts
+from passwords import get_hasher
+from search import backend_for, tokenize
+from tokens import get_signer
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def indexed_columns(model):
+    """Columns that lead an index (or the primary key), i.e. cheap to ORDER BY"""
+    table = model.__table__
+    names = [list(table.primary_key.columns)[0].name]
+    names += [list(index.columns)[0].name for index in table.indexes]
+    names += [column.name for column in table.columns if column.unique or column.index]
+    return tuple(dict.fromkeys(names))
+
+
+def prefix_match(column, term):
+    """Range form of LIKE 'term%' that any B-tree index on `column` can serve"""
+    return and_(column >= term, column < term + "\uffff")
+
+
+class EstimatedCount:
+    """
+    Stands in for the count query of an unfiltered list: get_list only calls
+    .scalar() on it. Search and filters swap it for the real count query.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class ScalableModelView(ModelView):
+    """
+    List view for large tables: only index-leading columns are sortable
+    (default order is the primary key), relationships in `column_select_related_list`
+    are joined into the page query, search goes through `search_clause`
+    (index-backed in every subclass; without one, Flask-Admin's LIKE search
+    on column_searchable_list) and, on PostgreSQL, an unfiltered list shows
+    the planner's row estimate instead of running COUNT(*).
+    """
+    page_size = 50
+    can_set_page_size = False
+
+    def __init__(self, model, session, **kwargs):
+        if self.column_sortable_list is None:
+            self.column_sortable_list = indexed_columns(model)
+        if self.column_default_sort is None:
+            self.column_default_sort = (indexed_columns(model)[0], True)
+        super().__init__(model, session, **kwargs)
+
+    def _estimated_rows(self):
+        if self.session.get_bind().dialect.name != "postgresql":
+            return None
+        estimate = self.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": self.model.__tablename__}).scalar()
+        # -1 / 0 until the table has been analyzed
+        if estimate is None or estimate < ESTIMATED_COUNT_THRESHOLD:
+            return None
+        return estimate
+
+    def get_count_query(self):
+        estimate = self._estimated_rows()
+        if estimate is not None:
+            return EstimatedCount(estimate)
+        return super().get_count_query()
+
+    def _exact_count(self, count_query):
+        # The estimate covers the whole table, not the search/filter results
+        if isinstance(count_query, EstimatedCount):
+            return super().get_count_query()
+        return count_query
+
+    def search_clause(self, terms):
+        """WHERE clause for the search terms, or None for Flask-Admin's own search"""
+        return None
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        terms = [term for term in search.split(" ") if term]
+        if not terms:
+            return query, count_query, joins, count_joins
+        count_query = self._exact_count(count_query)
+        clause = self.search_clause(terms)
+        if clause is None:
+            return super()._apply_search(query, count_query, joins, count_joins, search)
+        query = query.filter(clause)
+        if count_query is not None:
+            count_query = count_query.filter(clause)
+        return query, count_query, joins, count_joins
+
+    def _apply_filters(self, query, count_query, joins, count_joins, filters):
+        if filters:
+            count_query = self._exact_count(count_query)
+        return super()._apply_filters(query, count_query, joins, count_joins, filters)
+
+
+class CatalogModelView(ScalableModelView):
+    """
+    ModelView for the catalogs: derived columns are not editable and its
+    search uses the /search backend (GIN, FTS5 or in-memory index)
+    """
+
+    form_excluded_columns = ("favorite_count", "favorited_by")
+    column_searchable_list = ("name",)
+
+    def search_clause(self, terms):
+        table_name = self.model.__tablename__
+        tokens = tokenize(" ".join(terms))
+        if not tokens:
+            return false()
+        return backend_for(current_app.config).match_clause(table_name, tokens)
+
+
+class UserModelView(ScalableModelView):
+    """
+    The stored hash is never shown or edited: the forms take a new password
+    and store its hash. Revokes a user's tokens when an admin deactivates or
+    deletes them.
+    """
+
+    column_exclude_list = ("password",)
+    column_searchable_list = ("username", "email")
+    form_excluded_columns = ("password",)
+    form_extra_fields = {"new_password": PasswordField("Nueva contraseña")}
+
+    def search_clause(self, terms):
+        clauses = []
+        for term in terms:
+            matches = [prefix_match(User.username, term), prefix_match(User.email, term)]
+            if term.isdigit():
+                matches.append(User.id == int(term))
+            clauses.append(or_(*matches))
+        return and_(*clauses)
+
+    def on_model_change(self, form, model, is_created):
+        # Left empty on edit, the current password stays
+        if form.new_password.data:
+            model.password = get_hasher().hash(form.new_password.data)
+        elif is_created:
+            raise ValidationError("La contraseña es obligatoria")
+
+    def after_model_change(self, form, model, is_created):
+        if not is_created and not model.is_active:
+            get_signer().revoke_user(model.id)
+
+    def after_model_delete(self, model):
+        get_signer().revoke_user(model.id)
+
+
+class FavoriteModelView(ScalableModelView):
+    """
+    Keeps the favorite_count of the favorited row in step with admin edits.
+    The list joins the user and the favorited row into the page query, and
+    searching a number finds the favorites of that user id or target id.
+    The user and the favorited row form the primary key, so the edit form
+    leaves both out: moving a favorite is a delete plus a create.
+    """
+
+    def __init__(self, model, session, target, column, relation, **kwargs):
+        self.target = target
+        self.column = column
+        self.relation = relation
+        self.column_list = ("user_id", "user_rel", column, relation, "added_date")
+        self.column_select_related_list = (model.user_rel, getattr(model, relation))
+        self.column_searchable_list = ("user_id", column)
+        self.column_formatters = {
+            "user_rel": lambda view, context, model, name: model.user_rel.username,
+            relation: lambda view, context, model, name: getattr(model, relation).name,
+        }
+        super().__init__(model, session, **kwargs)
+
+    def search_clause(self, terms):
+        ids = [int(term) for term in terms if term.isdigit()]
+        if not ids:
+            return false()
+        column = getattr(self.model, self.column)
+        return or_(self.model.user_id.in_(ids), column.in_(ids))
+
+    def edit_form(self, obj=None):
+        form = super().edit_form(obj)
+        del form.user_rel
+        del form[self.relation]
+        return form
+
+    def on_model_change(self, form, model, is_created):
+        # Edits cannot change user_id or <target>_id (see edit_form), so
+        # only a new favorite moves a count
+        if is_created:
+            self.session.flush()
+            adjust_favorite_counts(self.target, [getattr(model, self.column)], 1)
+
+    def on_model_delete(self, model):
+        adjust_favorite_counts(self.target, [getattr(model, self.column)], -1)
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -10,11 +213,13 @@ def setup_admin(app):
 
     
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(People, db.session))
-    admin.add_view(ModelView(Favorite_people, db.session))
-    admin.add_view(ModelView(Planets, db.session))
-    admin.add_view(ModelView(Favorite_planets, db.session))
+    admin.add_view(UserModelView(User, db.session))
+    admin.add_view(CatalogModelView(People, db.session))
+    admin.add_view(FavoriteModelView(
+        Favorite_people, db.session, People, "people_id", "person_rel"))
+    admin.add_view(CatalogModelView(Planets, db.session))
+    admin.add_view(FavoriteModelView(
+        Favorite_planets, db.session, Planets, "planet_id", "planet_rel"))
 
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+The sitemap at `/` and the API description at `/openapi.json`.
+
+Both documents are built once per process, at the end of create_app() when
+every route (and the admin) is registered; with gunicorn's preload that is
+once in the master. Requests are answered from memory with a strong ETag,
+so health checks and crawlers hitting `/` cost a dict lookup or a 304.
+
+The spec is Swagger 2.0 generated by flask_swagger (only imported with
+ENABLE_OPENAPI). Every API route gets an operation derived from the URL map
+(path parameters, tag, summary from the first docstring line); a view with a
+YAML block after `---` in its docstring replaces it with its own description.
+"""
+import hashlib
+import inspect
+import os
+import re
+from flask import current_app, request
+from compression import choose_encoding, compress, mark_encoded
+from utils import APIException, generate_sitemap
+
+PARAM_TYPES = {"int": "integer", "float": "number"}
+
+
+class Document:
+    """A response body built once, with its ETag and compressed variants"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+
+def _operations(app):
+    paths = {}
+    for rule in app.url_map.iter_rules():
+        if not rule.endpoint.startswith("api."):
+            continue
+        path = re.sub(r"<(?:\w+:)?(\w+)>", r"{\1}", rule.rule)
+        segments = [part for part in rule.rule.split("/") if part and "<" not in part]
+        doc = inspect.getdoc(app.view_functions[rule.endpoint])
+        name = rule.endpoint.partition(".")[2]
+        operation = {
+            "operationId": name,
+            "summary": doc.splitlines()[0] if doc else name.replace("_", " "),
+            "tags": [segments[0] if segments else "sitemap"],
+            "responses": {"200": {"description": "OK"}},
+        }
+        parameters = [
+            {"name": arg, "in": "path", "required": True,
+             "type": PARAM_TYPES.get(converter, "string")}
+            for converter, arg in re.findall(r"<(?:(\w+):)?(\w+)>", rule.rule)
+        ]
+        if parameters:
+            operation["parameters"] = parameters
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            paths.setdefault(path, {})[method.lower()] = operation
+    return paths
+
+
+def build_openapi(app):
+    from flask_swagger import swagger
+    template = {
+        "info": {"title": "Star Wars API", "version": app.config["API_VERSION"]},
+        "paths": _operations(app),
+    }
+    spec = swagger(app, prefix=None, template=template)
+    return Document(app.json.dumps_bytes(spec), "application/json")
+
+
+def build_sitemap(app):
+    # url_for needs a request; the links are relative, so any will do
+    with app.test_request_context():
+        html = generate_sitemap(app)
+    return Document(html.encode(), "text/html")
+
+
+def document_response(name):
+    """The stored document `name`, compressed when negotiated, or a 304"""
+    document = current_app.extensions["apidocs"].get(name)
+    if document is None:
+        raise APIException("Documento no disponible", 404)
+    body, etag = document.body, document.etag
+    encoding = choose_encoding(len(body))
+    if encoding is not None:
+        body, etag = document.encoded(encoding), f"{etag}-{encoding}"
+    response = current_app.response_class(body, mimetype=document.mimetype)
+    if encoding is not None:
+        mark_encoded(response, encoding)
+    elif len(body) >= current_app.config["COMPRESS_MIN_SIZE"]:
+        response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def openapi():
+    return document_response("openapi")
+
+
+def init_apidocs(app):
+    """Builds the documents; call it after every blueprint is registered"""
+    app.config.setdefault("API_VERSION", os.getenv("API_VERSION", "1.0.0"))
+    documents = {}
+    if app.config["ENABLE_OPENAPI"]:
+        app.add_url_rule("/openapi.json", "openapi", openapi)
+        documents["openapi"] = build_openapi(app)
+    documents["sitemap"] = build_sitemap(app)
+    app.extensions["apidocs"] = documents
+    return documents
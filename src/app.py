@@ -2,63 +2,154 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Flask, Blueprint, current_app, request, jsonify, url_for
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
+from config import (database_url, engine_options, migrate_enabled, pool_status, profile_config,
+                    trusted_proxy_hops)
+from encoding import init_json
+from utils import APIException
+from apidocs import init_apidocs, document_response
+from pagination import list_response
+from projection import load_fields, parse_fields
+from cache import init_cache, cached_view
+from compression import init_compression
+from versions import bump_versions, conditional_view, favorites_version
+from bulk import init_bulk, bulk_import, parse_records, prepare_row, summarize
+from favorites import (add_favorite, id_list, init_favorites, missing_reference, remove_favorite,
+                       sync_favorites, top_response)
+from instrumentation import init_instrumentation
+from passwords import init_passwords, get_hasher
+from tokens import init_tokens, authorize, bearer_claims, get_signer
+from ratelimit import init_ratelimit, request_cost, BULK_COST, HASH_COST, LIST_COST
+from idempotency import init_idempotency, idempotent
+from metrics import init_metrics, metrics_response
+from search import index_inserted, search_response
+from upsert import insert_unique
 from models import db, User, People, Planets, Favorite_people, Favorite_planets
-from datetime import datetime
+from sqlalchemy import select, text
+from sqlalchemy.orm import selectinload
 # from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
+api = Blueprint("api", __name__)
+
+
+def create_app(profile=None, **overrides):
+    """
+    Builds the API. `profile` (default: the APP_PROFILE variable) selects a set
+    of settings from config.PROFILES; keyword arguments override single keys.
+    Flask-Admin, flask_swagger and Flask-Migrate (Alembic) are only imported
+    when enabled.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(profile_config(profile))
+    app.config.from_mapping(overrides)
+    app.url_map.strict_slashes = False
+    init_json(app)
+
+    app.config.setdefault('TRUSTED_PROXY_HOPS', trusted_proxy_hops())
+    hops = app.config['TRUSTED_PROXY_HOPS']
+    if hops:
+        # remote_addr (the rate limit key) and the scheme become the ones
+        # the trusted proxies saw, read from their X-Forwarded-* entries
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    db.init_app(app)
+    if migrate_enabled(app.config['ENABLE_MIGRATE']):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    CORS(app)
+    init_instrumentation(app)
+    init_metrics(app)
+    init_compression(app)
+    init_cache(app)
+    init_bulk(app)
+    init_favorites(app)
+    init_passwords(app)
+    init_tokens(app)
+    init_ratelimit(app)
+    init_idempotency(app)
+    app.register_blueprint(api)
+    if app.config['ENABLE_ADMIN']:
+        from admin import setup_admin
+        setup_admin(app)
+    init_apidocs(app)
+    return app
 
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace(
-        "postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
 
 # Handle/serialize errors like a JSON object
 
 
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
-# generate sitemap with all your endpoints
+# sitemap with all your endpoints, generated once in create_app()
 
 
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return document_response("sitemap")
+
+
+@api.route('/metrics')
+def metrics():
+    return metrics_response(current_app.extensions["metrics"])
+
+
+@api.route('/health')
+def health():
+    options = current_app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    response_body = {
+        "pool": pool_status(db.engine),
+        "pool_config": {
+            "pool_size": options.get("pool_size"),
+            "max_overflow": options.get("max_overflow"),
+            "pgbouncer": "poolclass" in options
+        }
+    }
+    try:
+        db.session.execute(text("SELECT 1"))
+    except Exception:
+        db.session.rollback()
+        response_body["database"] = "unavailable"
+        return jsonify(response_body), 503
+    response_body["database"] = "ok"
+    return jsonify(response_body), 200
+
 
+@api.route('/search', methods=['GET'])
+@request_cost(LIST_COST)
+def search_catalog():
+    return search_response(request.args)
 
-@app.route('/user', methods=['POST'])
+
+@api.route('/user', methods=['POST'])
+@request_cost(HASH_COST)
+@idempotent
 def create_user():
     body = request.get_json()
 
-    if not body.get("email") or not body.get("password") or not body.get("username"):
+    # Strings only: the hasher and the unique lookups need text, not numbers
+    if not isinstance(body, dict) or not all(
+            isinstance(body.get(field), str) and body[field]
+            for field in ("email", "password", "username")):
         return jsonify({"msg": "Email, password y username son requeridos"}), 400
 
     user_email_exists = User.query.filter_by(email=body['email']).first()
-    user_name_exists = User.query.filter_by(email=body['username']).first()
+    user_name_exists = User.query.filter_by(username=body['username']).first()
     if user_email_exists or user_name_exists:
         return jsonify({"msg": "Ese correo electrónico o el usurio ya está registrado"}), 409
 
     user = User()
     user.username = body.get('username')
     user.email = body.get('email')
-    user.password = body.get('password')
+    user.password = get_hasher().hash(body.get('password'))
     user.is_active = True
 
     db.session.add(user)
@@ -66,280 +157,358 @@ def create_user():
     return jsonify(user.serialize()), 200
 
 
-@app.route('/user/<int:user_id>', methods=['DELETE'])
+@api.route('/login', methods=['POST'])
+@request_cost(HASH_COST)
+def login():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    identifier = body.get("email") or body.get("username")
+    password = body.get("password")
+    if not isinstance(identifier, str) or not isinstance(password, str) \
+            or not identifier or not password:
+        return jsonify({"msg": "Email (o username) y password son requeridos"}), 400
+
+    column = User.email if body.get("email") else User.username
+    user = db.session.execute(select(User).where(column == identifier)).scalar_one_or_none()
+    hasher = get_hasher()
+    if user is None:
+        hasher.dummy_verify(password)
+        return jsonify({"msg": "Credenciales inválidas"}), 401
+
+    valid, new_hash = hasher.verify(user.password, password)
+    if not valid:
+        return jsonify({"msg": "Credenciales inválidas"}), 401
+    if new_hash is not None:
+        # Stored with older parameters (or in plain text): upgrade it now
+        user.password = new_hash
+        db.session.commit()
+    if not user.is_active:
+        return jsonify({"msg": "Usuario inactivo"}), 403
+    signer = get_signer()
+    response_body = {
+        "msg": "Inicio de sesión correcto",
+        "user": user.serialize(),
+        "token": signer.issue(user),
+        "expires_in": signer.ttl
+    }
+    return jsonify(response_body), 200
+
+
+@api.route('/logout', methods=['POST'])
+def logout():
+    claims = bearer_claims()
+    if claims is None:
+        return jsonify({"msg": "Se requiere un token"}), 401
+    get_signer().revoke(claims)
+    return jsonify({"msg": "Sesión cerrada"}), 200
+
+
+@api.route('/user/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get(user_id)
     if user is None:
         return jsonify({"msg": "Usuario no encontrado"}), 404
     db.session.delete(user)
     db.session.commit()
+    get_signer().revoke_user(user_id)
 
     return jsonify({"msg": f"Usuario {user_id} eliminado"}), 200
 
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
+@request_cost(LIST_COST)
+@conditional_view(["user"])
 def users_list():
+    return list_response(User, request.args, "Lista de Usuarios", "users")
 
-    users = User.query.all()
-    users = list(map(lambda user: user.serialize(), users))
 
-    response_body = {
-        "msg": "Lista de Usuarios",
-        "users": users
-    }
-
-    return jsonify(response_body), 200
-
-
-@app.route('/people', methods=['GET'])
+@api.route('/people', methods=['GET'])
+@request_cost(LIST_COST)
+@conditional_view(["people"])
+@cached_view("people")
 def people_list():
-    people = People.query.all()
-    people = list(map(lambda people: people.serialize(), people))
+    return list_response(People, request.args, "Lista de Personajes", "personajes")
 
-    response_body = {
-        "msg": "Lista de Personajes",
-        "personajes": people
-    }
 
-    return jsonify(response_body), 200
+@api.route('/people/top', methods=['GET'])
+@request_cost(2)
+def people_top():
+    return top_response(People, request.args, "Personajes más populares", "personajes")
 
 
-@app.route('/people', methods=['POST'])
+@api.route('/people', methods=['POST'])
+@idempotent
 def create_person():
     body = request.get_json()
 
-    if not body or "name" not in body:
+    if not isinstance(body, dict) or not isinstance(body.get("name"), str) \
+            or not body["name"].strip():
         return jsonify({"msg": "El nombre del personaje es obligatorio"}), 400
 
-    person_exists = People.query.filter_by(name=body['name']).first()
-    if person_exists:
-        return jsonify({"msg": "Este personaje ya está registrado"}), 400
-
-    new_person = People()
-    new_person.name = body.get("name"),
-    new_person.height = body.get("height"),
-    new_person.mass = body.get("mass"),
-    new_person.hair_color = body.get("hair_color"),
-    new_person.skin_color = body.get("skin_color"),
-    new_person.eye_color = body.get("eye_color"),
-    new_person.birth_year = body.get("birth_year"),
-    new_person.gender = body.get("gender")
-
-    db.session.add(new_person)
+    # Same coercion as the bulk import ("1,000" -> 1000, "unknown" -> None)
+    values, error = prepare_row(People, body)
+    if error:
+        return jsonify({"msg": error}), 400
+    # ON CONFLICT DO NOTHING on the unique name: one statement, and of two
+    # concurrent requests for the same name exactly one creates the row
+    person_id = insert_unique(People, values)
+    if person_id is None:
+        db.session.rollback()
+        return jsonify({"msg": "Este personaje ya está registrado"}), 409
+
+    # Core INSERTs skip the ORM flush hooks, so stamp the version here
+    bump_versions(["people"])
     db.session.commit()
-    return jsonify(new_person.serialize()), 201
+    index_inserted("people", {person_id: values})
+    return jsonify(People(id=person_id, **values).serialize()), 201
+
+
+def _bulk_response(table):
+    records = parse_records(request.get_data(),
+                            ndjson=request.mimetype == "application/x-ndjson")
+    chunk_size = request.args.get("chunk_size", type=int)
+    if chunk_size is None and "chunk_size" in request.args:
+        raise APIException("chunk_size debe ser un entero positivo", 400)
+    results = bulk_import(table, records, chunk_size)
+    response_body = summarize(results)
+    response_body["results"] = results
+    return jsonify(response_body), 200
 
 
-@app.route('/people/<int:people_id>', methods=['GET'])
+@api.route('/people/bulk', methods=['POST'])
+@request_cost(BULK_COST)
+def create_people_bulk():
+    return _bulk_response("people")
+
+
+@api.route('/people/<int:people_id>', methods=['GET'])
+@conditional_view(["people"])
+@cached_view("people", id_arg="people_id")
 def people(people_id):
-    people = People.query.get(people_id)
+    fields = parse_fields(People, request.args)
+    people = db.session.execute(
+        select(People).options(*load_fields(People, fields))
+        .where(People.id == people_id)).scalar_one_or_none()
     if people is None:
         return jsonify({"msg": "Personaje no encontrado"}), 404
 
-    people_exist = People.query.filter_by(id=people_id).first()
     response_body = {
-        "personajes": people_exist
+        "personajes": people.serialize(fields)
     }
     return jsonify(response_body), 200
 
 
-@app.route('/planet', methods=['GET'])
+@api.route('/planet', methods=['GET'])
+@request_cost(LIST_COST)
+@conditional_view(["planet"])
+@cached_view("planet")
 def planet_list():
-    planet = Planets.query.all()
-    planet = list(map(lambda planet: planet.serialize(), planet))
+    return list_response(Planets, request.args, "Lista de Planetas", "Planetas")
 
-    response_body = {
-        "msg": "Lista de Planetas",
-        "Planetas": planet
-    }
 
-    return jsonify(response_body), 200
+@api.route('/planet/top', methods=['GET'])
+@request_cost(2)
+def planet_top():
+    return top_response(Planets, request.args, "Planetas más populares", "Planetas")
 
 
-@app.route('/planet/<int:planet_id>', methods=['GET'])
+@api.route('/planet/<int:planet_id>', methods=['GET'])
+@conditional_view(["planet"])
+@cached_view("planet", id_arg="planet_id")
 def planet(planet_id):
-    planet = Planets.query.get(planet_id)
+    fields = parse_fields(Planets, request.args)
+    planet = db.session.execute(
+        select(Planets).options(*load_fields(Planets, fields))
+        .where(Planets.id == planet_id)).scalar_one_or_none()
     if planet is None:
         return jsonify({"msg": "Planeta no encontrado"}), 404
-    return jsonify(planet.serialize()), 200
+    return jsonify(planet.serialize(fields)), 200
 
 
-@app.route('/planets', methods=['POST'])
+@api.route('/planets', methods=['POST'])
+@idempotent
 def create_planet():
     body = request.get_json()
 
-    if not body or "name" not in body:
+    if not isinstance(body, dict) or not isinstance(body.get("name"), str) \
+            or not body["name"].strip():
         return jsonify({"msg": "El nombre del planeta es obligatorio"}), 400
 
-    planet_exists = Planets.query.filter_by(name=body['name']).first()
-    if planet_exists:
-        return jsonify({"msg": "Este planeta ya está registrado"}), 400
-
-    new_planet = Planets()
-    new_planet.name = body.get("name"),
-    new_planet.rotation_period = body.get("rotation_period"),
-    new_planet.orbital_period = body.get("orbital_period"),
-    new_planet.diameter = body.get("diameter"),
-    new_planet.climate = body.get("climate"),
-    new_planet.gravity = body.get("gravity"),
-    new_planet.terrain = body.get("terrain"),
-    new_planet.surface_water = body.get("surface_water"),
-    new_planet.population = body.get("population")
-
-    db.session.add(new_planet)
+    values, error = prepare_row(Planets, body)
+    if error:
+        return jsonify({"msg": error}), 400
+    planet_id = insert_unique(Planets, values)
+    if planet_id is None:
+        db.session.rollback()
+        return jsonify({"msg": "Este planeta ya está registrado"}), 409
+
+    bump_versions(["planet"])
     db.session.commit()
-    return jsonify(new_planet.serialize()), 201
+    index_inserted("planet", {planet_id: values})
+    return jsonify(Planets(id=planet_id, **values).serialize()), 201
+
 
+@api.route('/planets/bulk', methods=['POST'])
+@request_cost(BULK_COST)
+def create_planets_bulk():
+    return _bulk_response("planet")
 
-@app.route('/<int:user_id>/favoritePlanet/<int:planet_id>', methods=['POST'])
+
+@api.route('/<int:user_id>/favoritePlanet/<int:planet_id>', methods=['POST'])
 # <-- Los nombres deben coincidir con la ruta
+@idempotent
 def create_favorite_planet(user_id, planet_id):
-    # 1. Validar si el usuario existe
-    user_exist = User.query.get(user_id)
-    if not user_exist:
-        # 404 es más preciso para "Not Found"
-        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
+    authorize(user_id)
 
-    # 2. Validar si el planeta existe
-    planet_exists = Planets.query.get(planet_id)
-    if not planet_exists:
+    # Una sola sentencia: inserta solo si el planeta y el usuario existen
+    # y si no era favorito ya, así dos peticiones iguales no crean dos filas
+    favorite = add_favorite("planets", user_id, planet_id)
+    if favorite is not None:
+        return jsonify(favorite.serialize()), 201
+
+    missing = missing_reference("planets", user_id, planet_id)
+    if missing == "user":
+        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
+    if missing == "target":
         return jsonify({"msg": "Este planeta no está registrado"}), 404
-    
-    # 3. Validar si ya es favorito (Evitar duplicados)
-    already_exist = Favorite_planets.query.filter_by(
-        user_id=user_id,
-        planet_id=planet_id
-    ).first()
-
-    if already_exist:
-        # 400 o 409 (Conflict) es mejor que 405
-        return jsonify({"msg": "Este planeta ya está en tus favoritos"}), 400
-
-    # 4. Crear el nuevo registro
-    new_favorite_planet = Favorite_planets()
-    new_favorite_planet.user_id = user_id
-    new_favorite_planet.planet_id = planet_id
-    new_favorite_planet.added_date = datetime.now()
+    return jsonify({"msg": "Este planeta ya está en tus favoritos"}), 409
 
-    try:
-        db.session.add(new_favorite_planet)
-        db.session.commit()
-        return jsonify(new_favorite_planet.serialize()), 201
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"msg": "Error interno del servidor"}), 500
-    
-@app.route('/<int:user_id>/favoritePlanet/<int:planet_id>', methods=['DELETE'])
+
+@api.route('/<int:user_id>/favoritePlanet/<int:planet_id>', methods=['DELETE'])
 # <-- Los nombres deben coincidir con la ruta
 def delete_favorite_planet(user_id, planet_id):
-    # 1. Validar si el usuario existe
-    user_exist = User.query.get(user_id)
-    if not user_exist:
-        # 404 es más preciso para "Not Found"
-        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
-
-    # 2. Validar si el planeta existe
-    planet_exists = Planets.query.get(planet_id)
-    if not planet_exists:
-        return jsonify({"msg": "Este planeta no está registrado"}), 404
+    authorize(user_id)
 
-    # 3. Validar si ya es favorito (Evitar duplicados)
-    already_exist = Favorite_planets.query.filter_by(
-        user_id=user_id,
-        planet_id=planet_id
-    ).first()
+    if remove_favorite("planets", user_id, planet_id):
+        return jsonify({"msg": f"favorito {planet_id} eliminado"}), 200
 
-    if not already_exist:
-        # 400 o 409 (Conflict) es mejor que 405
-        return jsonify({"msg": "Este planeta ya está en tus favoritos"}), 400
-    try:
-        db.session.delete(already_exist)
-        db.session.commit()
-        return jsonify({"msg": f"favorito {already_exist} eliminado"}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"msg": "Error interno del servidor"}), 500
+    missing = missing_reference("planets", user_id, planet_id)
+    if missing == "user":
+        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
+    if missing == "target":
+        return jsonify({"msg": "Este planeta no está registrado"}), 404
+    return jsonify({"msg": "Este planeta no está en tus favoritos"}), 404
 
 
-@app.route('/<int:user_id>/favoritePeople/<int:people_id>', methods=['POST'])
+@api.route('/<int:user_id>/favoritePeople/<int:people_id>', methods=['POST'])
 # <-- Los nombres deben coincidir con la ruta
+@idempotent
 def create_favorite_people(user_id, people_id):
-    # 1. Validar si el usuario existe
-    user_exist = User.query.get(user_id)
-    if not user_exist:
-        # 404 es más preciso para "Not Found"
+    authorize(user_id)
+
+    # Una sola sentencia: inserta solo si el personaje y el usuario existen
+    # y si no era favorito ya, así dos peticiones iguales no crean dos filas
+    favorite = add_favorite("people", user_id, people_id)
+    if favorite is not None:
+        return jsonify(favorite.serialize()), 201
+
+    missing = missing_reference("people", user_id, people_id)
+    if missing == "user":
         return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
+    if missing == "target":
+        return jsonify({"msg": "Este personaje no está registrado"}), 404
+    return jsonify({"msg": "Este personaje ya está en tus favoritos"}), 409
+
+
+@api.route('/<int:user_id>/favoritePeople/<int:people_id>', methods=['DELETE'])
+# <-- Los nombres deben coincidir con la ruta
+def delete_favorite_people(user_id, people_id):
+    authorize(user_id)
 
-    # 2. Validar si el planeta existe
-    people_exists = People.query.get(people_id)
-    if not people_exists:
+    if remove_favorite("people", user_id, people_id):
+        return jsonify({"msg": f"favorito {people_id} eliminado"}), 200
+
+    missing = missing_reference("people", user_id, people_id)
+    if missing == "user":
+        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
+    if missing == "target":
         return jsonify({"msg": "Este personaje no está registrado"}), 404
+    return jsonify({"msg": "Este personaje no está en tus favoritos"}), 404
 
-    # 3. Validar si ya es favorito (Evitar duplicados)
-    already_exist = Favorite_people.query.filter_by(
-        user_id=user_id,
-        people_id=people_id
-    ).first()
 
-    if already_exist:
-        # 400 o 409 (Conflict) es mejor que 405
-        return jsonify({"msg": "Este personaje ya está en tus favoritos"}), 400
+@api.route('/user/<int:user_id>/favorites', methods=['GET'])
+@request_cost(2)
+@conditional_view(lambda user_id: [favorites_version(user_id), "people", "planet"])
+def user_favorite(user_id):
+    # Three fixed round trips: the user, then one selectin per favorites
+    # collection with the related People/Planets joined in
+    user = db.session.execute(
+        select(User)
+        .where(User.id == user_id)
+        .options(
+            selectinload(User.favorites_people).joinedload(
+                Favorite_people.person_rel),
+            selectinload(User.favorites_planets).joinedload(
+                Favorite_planets.planet_rel)
+        )
+    ).scalar_one_or_none()
+    if user is None:
+        return jsonify({"msg": "usuario no encontrado"}), 404
 
-    # 4. Crear el nuevo registro
-    new_favorite_people = Favorite_people()
-    new_favorite_people.user_id = user_id
-    new_favorite_people.people_id = people_id
-    new_favorite_people.added_date = datetime.now()
+    favorites_people = []
+    for favorite in user.favorites_people:
+        item = favorite.serialize()
+        item["people"] = favorite.person_rel.serialize()
+        favorites_people.append(item)
 
-    db.session.add(new_favorite_people)
-    db.session.commit()
-    return jsonify(new_favorite_people.serialize()), 201
+    favorites_planets = []
+    for favorite in user.favorites_planets:
+        item = favorite.serialize()
+        item["planet"] = favorite.planet_rel.serialize()
+        favorites_planets.append(item)
 
+    response_body = {
+        "msg": "Favoritos del usuario",
+        "user_id": user.id,
+        "favorites_people": favorites_people,
+        "favorites_planets": favorites_planets
+    }
+    return jsonify(response_body), 200
 
-@app.route('/<int:user_id>/favoritePeople/<int:people_id>', methods=['DELETE'])
-# <-- Los nombres deben coincidir con la ruta
-def delete_favorite_people(user_id, people_id):
-    # 1. Validar si el usuario existe
-    user_exist = User.query.get(user_id)
-    if not user_exist:
-        # 404 es más preciso para "Not Found"
-        return jsonify({'msg': 'No se pudo encontrar ningún usuario'}), 404
 
-    # 2. Validar si el planeta existe
-    people_exists = People.query.get(people_id)
-    if not people_exists:
-        return jsonify({"msg": "Este planeta no está registrado"}), 404
+@api.route('/user/<int:user_id>/favorites', methods=['PUT'])
+def replace_user_favorites(user_id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"msg": "El cuerpo debe ser un objeto JSON"}), 400
+    # Replacing with an empty set deletes everything, so it must be explicit
+    if "people" not in body or "planets" not in body:
+        return jsonify({"msg": "'people' y 'planets' son requeridos"}), 400
+    add = {kind: id_list(body, kind) for kind in ("people", "planets")}
+    remove = {"people": [], "planets": []}
 
-    # 3. Validar si ya es favorito (Evitar duplicados)
-    already_exist = Favorite_people.query.filter_by(
-        user_id=user_id,
-        people_id=people_id
-    ).first()
+    added, removed = sync_favorites(user_id, add, remove, replace=True,
+                                    user_checked=authorize(user_id))
+    return jsonify({"msg": "Favoritos actualizados", "added": added, "removed": removed}), 200
 
-    if not already_exist:
-        # 400 o 409 (Conflict) es mejor que 405
-        return jsonify({"msg": "Este planeta ya está en tus favoritos"}), 400
-    try:
-        db.session.delete(already_exist)
-        db.session.commit()
-        return jsonify({"msg": f"favorito {already_exist} eliminado"}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"msg": "Error interno del servidor"}), 500
 
+@api.route('/user/<int:user_id>/favorites', methods=['PATCH'])
+def update_user_favorites(user_id):
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"msg": "El cuerpo debe ser un objeto JSON"}), 400
+    if "add" not in body and "remove" not in body:
+        return jsonify({"msg": "'add' o 'remove' es requerido"}), 400
+    add = {kind: id_list(body.get("add"), kind) for kind in ("people", "planets")}
+    remove = {kind: id_list(body.get("remove"), kind)
+              for kind in ("people", "planets")}
+
+    added, removed = sync_favorites(user_id, add, remove, user_checked=authorize(user_id))
+    return jsonify({"msg": "Favoritos actualizados", "added": added, "removed": removed}), 200
 
-@app.route('/user/<int:user_id>/favorites', methods=['GET'])
-def user_favorite(user_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return jsonify({"msg": "usuario no encontrado"}), 404
 
-    favorites = Favorite_people.query.get(user_id)
-    if favorites is None:
-        return jsonify({"msg": "usuario sin favoritos"}), 404
+def __getattr__(name):
+    # `from app import app` (wsgi.py, gunicorn.conf.py, flask's CLI, the
+    # benchmarks) builds the default app on first access
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
@@ -0,0 +1,176 @@
+"""
+Bulk import of People and Planets from JSON arrays or NDJSON, used by the
+`/people/bulk` and `/planets/bulk` endpoints and the `flask import-catalog`
+command.
+
+Each chunk costs one multi-row INSERT that skips names already stored and one
+commit, instead of a SELECT + INSERT + COMMIT per record. The rows the INSERT
+returns are the created ones, the rest are duplicates, so two imports of the
+same file running at once never fail on the unique name.
+"""
+import json
+import os
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Integer, select
+from utils import APIException
+from models import db, People, Planets
+from versions import bump_versions
+from search import index_inserted
+from upsert import insert_ignore, supports_returning
+
+DEFAULT_CHUNK_SIZE = 500
+
+CATALOGS = {
+    "people": People,
+    "planet": Planets
+}
+
+
+def parse_records(data, ndjson=False):
+    """Accepts a JSON array or newline-delimited JSON objects"""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    try:
+        if ndjson:
+            return [json.loads(line) for line in data.splitlines() if line.strip()]
+        records = json.loads(data)
+    except ValueError:
+        raise APIException("El cuerpo no es JSON/NDJSON válido", 400)
+    if not isinstance(records, list):
+        raise APIException("Se esperaba una lista de registros", 400)
+    return records
+
+
+def _columns(model):
+    derived = getattr(model, "DERIVED_FIELDS", ())
+    return [column for column in model.__table__.columns
+            if not column.primary_key and column.name not in derived]
+
+
+def _coerce(column, value):
+    """Returns the stored value, or raises ValueError when it does not fit the column"""
+    if value is None or not isinstance(column.type, Integer):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("", "unknown", "n/a", "none"):
+        return None
+    return int(str(value).replace(",", ""))
+
+
+def prepare_row(model, record):
+    """
+    The row to insert for `record`, with integer columns coerced, as
+    (row, None); or (None, message) when it has no name or a value does not
+    fit. The single-row create endpoints go through it too.
+    """
+    if not isinstance(record, dict) or not isinstance(record.get("name"), str) \
+            or not record["name"].strip():
+        return None, "El nombre es obligatorio"
+    # Multi-row VALUES needs the same keys on every row
+    row = {column.name: None for column in _columns(model)}
+    for column in _columns(model):
+        if column.name in record:
+            try:
+                row[column.name] = _coerce(column, record[column.name])
+            except (TypeError, ValueError):
+                return None, f"Valor inválido para '{column.name}'"
+    return row, None
+
+
+def _insert_chunk(model, rows):
+    """
+    Inserts rows with one multi-row INSERT that skips names already stored and
+    returns {name: id} of the inserted ones (ids are None without RETURNING)
+    """
+    if supports_returning():
+        result = db.session.execute(
+            insert_ignore(model, rows).returning(model.id, model.name))
+        return {name: row_id for row_id, name in result}
+    # Without RETURNING the stored names are looked up first; a name taken by
+    # a concurrent import in between is still skipped by the INSERT
+    existing = set(db.session.execute(
+        select(model.name).where(model.name.in_([row["name"] for row in rows]))
+    ).scalars())
+    rows = [row for row in rows if row["name"] not in existing]
+    if rows:
+        db.session.execute(insert_ignore(model, rows))
+    return {row["name"]: None for row in rows}
+
+
+def bulk_import(table, records, chunk_size=None):
+    """
+    Imports `records` into the `table` catalog ("people" or "planet") and
+    returns one result per input record, in input order
+    """
+    model = CATALOGS[table]
+    if chunk_size is None:
+        chunk_size = current_app.config.get("BULK_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+    if chunk_size < 1:
+        raise APIException("chunk_size debe ser un entero positivo", 400)
+    results = [None] * len(records)
+
+    for start in range(0, len(records), chunk_size):
+        pending = {}
+        for index in range(start, min(start + chunk_size, len(records))):
+            row, error = prepare_row(model, records[index])
+            if error:
+                results[index] = {"index": index, "status": "invalid", "msg": error}
+            elif row["name"] in pending:
+                results[index] = {"index": index, "name": row["name"],
+                                  "status": "duplicate"}
+            else:
+                pending[row["name"]] = (index, row)
+
+        if not pending:
+            continue
+
+        ids = _insert_chunk(model, [row for _, row in pending.values()])
+        if ids:
+            # Core INSERTs skip the ORM flush hooks, so stamp the version here
+            bump_versions([table])
+        db.session.commit()
+        if ids and None not in ids.values():
+            index_inserted(table, {ids[name]: row for name, (_, row) in pending.items()
+                                   if name in ids})
+        for name, (index, row) in pending.items():
+            if name in ids:
+                results[index] = {"index": index, "name": name,
+                                  "status": "created", "id": ids[name]}
+            else:
+                results[index] = {"index": index, "name": name, "status": "duplicate"}
+    return results
+
+
+def summarize(results):
+    summary = {"created": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return summary
+
+
+@click.command("import-catalog")
+@click.argument("table", type=click.Choice(sorted(CATALOGS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--chunk-size", type=click.IntRange(min=1), default=None,
+              help="Registros por commit (por defecto BULK_CHUNK_SIZE)")
+@with_appcontext
+def import_catalog_command(table, path, chunk_size):
+    """Importa personajes o planetas desde un archivo JSON o NDJSON"""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        records = parse_records(data, ndjson=path.endswith((".ndjson", ".jsonl")))
+    except APIException as e:
+        raise click.ClickException(e.message)
+    results = bulk_import(table, records, chunk_size)
+    for result in results:
+        if result["status"] == "invalid":
+            click.echo(f"#{result['index']}: {result['msg']}", err=True)
+    click.echo(json.dumps(summarize(results)))
+
+
+def init_bulk(app):
+    app.config.setdefault("BULK_CHUNK_SIZE", int(
+        os.getenv("BULK_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)))
+    app.cli.add_command(import_catalog_command)
@@ -0,0 +1,291 @@
+"""
+Read-through response cache for the catalog endpoints.
+
+Backends share a small Redis-compatible surface (get, set with `ex`/`nx`,
+delete, incr) so the in-process LRU, the local fake and a real Redis client are
+interchangeable. The database backend (get, set and delete only) keeps state
+that every worker must see, like token revocations and idempotency keys, in
+the app's own database when there is no Redis server. Entries are keyed by the table's version stamp (see
+versions.current_stamp), which every write bumps in the database inside its
+own transaction: after a write on any worker or host, every worker computes
+a new key and misses, so no process can serve a body older than the ETag it
+sends. Superseded entries are never read again and age out by TTL/LRU.
+Compressed variants of a body are stored under the body's key plus the
+encoding and expire with it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, request
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from compression import choose_encoding, compress, mark_encoded
+from models import db, SharedEntry
+from upsert import insert_or_update, is_unique_violation
+from versions import current_stamp
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class LRUCache:
+    """In-process backend: least recently used eviction plus per-key TTL"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        # Counters live outside the LRU so eviction can never rewind them
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._alive(key, time.monotonic())
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.monotonic()
+        expires_at = now + ex if ex else None
+        with self._lock:
+            if nx and self._alive(key, now) is not None:
+                return None
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return True
+
+    def delete(self, *keys):
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+                elif self._counters.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+
+class FakeRedis(LRUCache):
+    """Unbounded stand-in for a Redis client, for local runs and tests"""
+
+    def __init__(self):
+        super().__init__(max_entries=float("inf"))
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+        return True
+
+
+class DatabaseStore:
+    """
+    Backend on the shared_entry table. Every call runs in its own short
+    transaction on its own connection, never in the request's session, so a
+    claimed key or a revocation is visible to the other workers at once.
+    """
+    # Expired rows are deleted on every PRUNE_EVERY-th write of a process
+    PRUNE_EVERY = 200
+
+    def __init__(self):
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with db.engine.connect() as conn:
+            value = conn.execute(select(SharedEntry.value).where(
+                SharedEntry.key == key,
+                or_(SharedEntry.expires_at.is_(None), SharedEntry.expires_at > now))).scalar()
+        return bytes(value) if value is not None else None
+
+    def set(self, key, value, ex=None, nx=False):
+        now = time.time()
+        values = {"key": key, "value": value, "expires_at": now + ex if ex else None}
+        try:
+            with db.engine.begin() as conn:
+                # An expired row counts as absent
+                conn.execute(delete(SharedEntry).where(
+                    SharedEntry.key == key, SharedEntry.expires_at <= now))
+                if nx:
+                    # The primary key makes the claim atomic across workers
+                    conn.execute(insert(SharedEntry).values(values))
+                else:
+                    conn.execute(insert_or_update(SharedEntry, values, ["key"]))
+                if self._should_prune():
+                    conn.execute(delete(SharedEntry).where(SharedEntry.expires_at <= now))
+        except IntegrityError as error:
+            if nx and is_unique_violation(error):
+                return None
+            raise
+        return True
+
+    def delete(self, *keys):
+        with db.engine.begin() as conn:
+            return conn.execute(delete(SharedEntry).where(SharedEntry.key.in_(keys))).rowcount
+
+    def _should_prune(self):
+        with self._lock:
+            self._writes += 1
+            return self._writes % self.PRUNE_EVERY == 0
+
+
+def make_backend(name, url=None, max_entries=DEFAULT_MAX_ENTRIES):
+    if name == "memory":
+        return LRUCache(max_entries)
+    if name == "database":
+        return DatabaseStore()
+    if name == "fake":
+        return FakeRedis()
+    if name == "redis":
+        # Optional dependency, only needed when a Redis server is configured
+        import redis
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def list_key(table, stamp, query_string):
+        return f"{table}:list:{stamp}:{query_string}"
+
+    @staticmethod
+    def item_key(table, item_id, stamp):
+        return f"{table}:item:{item_id}:{stamp}"
+
+    @staticmethod
+    def variant_key(key, encoding):
+        return f"{key}:{encoding}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, ex=self.ttl)
+
+    def encoded(self, key, body, encoding):
+        """Compressed variant of a cached body, compressed once and then reused"""
+        variant_key = self.variant_key(key, encoding)
+        data = self.backend.get(variant_key)
+        if data is None:
+            data = compress(body, encoding)
+            self.backend.set(variant_key, data, ex=self.ttl)
+        return data
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
+
+
+def shared_backend(config):
+    """
+    Default backend for state that must be the same in every worker: redis
+    when the cache uses it, else the database. "memory" is per process, so
+    with several gunicorn workers only the one that wrote a key would see it.
+    """
+    return "redis" if config.get("CACHE_BACKEND") == "redis" else "database"
+
+
+def init_cache(app):
+    app.config.setdefault("CACHE_BACKEND", os.getenv("CACHE_BACKEND", "memory"))
+    app.config.setdefault("CACHE_REDIS_URL", os.getenv("CACHE_REDIS_URL"))
+    app.config.setdefault("CACHE_TTL", int(
+        os.getenv("CACHE_TTL", DEFAULT_TTL)))
+    app.config.setdefault("CACHE_MAX_ENTRIES", int(
+        os.getenv("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+
+    backend = make_backend(app.config["CACHE_BACKEND"],
+                           app.config["CACHE_REDIS_URL"],
+                           app.config["CACHE_MAX_ENTRIES"])
+    cache = ResponseCache(backend, app.config["CACHE_TTL"])
+    app.extensions["response_cache"] = cache
+    return cache
+
+
+def get_cache():
+    return current_app.extensions["response_cache"]
+
+
+def cached_view(table, id_arg=None):
+    """
+    Caches the serialized JSON body of a successful GET, and its gzip/brotli
+    variants as clients ask for them. With `id_arg` the entry is a point
+    lookup keyed by that URL argument, otherwise it is a list page keyed by
+    the query string. Streamed responses are never cached. Wrapped in
+    versions.conditional_view it reuses the stamp that decorator computed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Only the default projection of a point lookup is cached
+            if request.args.get("stream") or (id_arg is not None and request.query_string):
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            stamp = g.get("version_stamp") or current_stamp([table])[0]
+            if id_arg is not None:
+                key = cache.item_key(table, kwargs[id_arg], stamp)
+            else:
+                key = cache.list_key(table, stamp, request.query_string.decode())
+
+            body = cache.get(key)
+            if body is not None:
+                response = Response(body, mimetype="application/json")
+                response.headers["X-Cache"] = "HIT"
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                response.headers["X-Cache"] = "MISS"
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                cache.set(key, body)
+
+            encoding = choose_encoding(len(body))
+            if encoding is not None:
+                response.set_data(cache.encoded(key, body, encoding))
+                mark_encoded(response, encoding)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+"""
+gzip / brotli response compression negotiated through Accept-Encoding.
+
+Buffered responses are compressed only from COMPRESS_MIN_SIZE bytes up;
+streamed ones (?stream=) are compressed chunk by chunk. COMPRESS_LEVEL is the
+gzip level (1-9) and COMPRESS_BR_QUALITY the brotli quality (0-11); brotli is
+offered only when the `brotli` package is installed. cache.cached_view stores
+the compressed variants of cached bodies next to them (see ResponseCache).
+"""
+import gzip
+import os
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/html", "text/plain")
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(size=None):
+    """Best encoding the client accepts for a body of `size` bytes, or None"""
+    if size is not None and size < current_app.config["COMPRESS_MIN_SIZE"]:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def compress(data, encoding):
+    config = current_app.config
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BR_QUALITY"])
+    return gzip.compress(data, compresslevel=config["COMPRESS_LEVEL"], mtime=0)
+
+
+def _compress_stream(chunks, encoding, config):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config["COMPRESS_BR_QUALITY"])
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(config["COMPRESS_LEVEL"], zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def mark_encoded(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+def _compressible(response):
+    return (response.mimetype in COMPRESSIBLE_TYPES
+            and 200 <= response.status_code < 300 and response.status_code != 204
+            and "Content-Encoding" not in response.headers
+            and not response.direct_passthrough)
+
+
+def init_compression(app):
+    app.config.setdefault("COMPRESS_MIN_SIZE", int(os.getenv("COMPRESS_MIN_SIZE", 1024)))
+    app.config.setdefault("COMPRESS_LEVEL", int(os.getenv("COMPRESS_LEVEL", 6)))
+    app.config.setdefault("COMPRESS_BR_QUALITY", int(os.getenv("COMPRESS_BR_QUALITY", 4)))
+
+    @app.after_request
+    def compress_response(response):
+        if request.method == "HEAD" or not _compressible(response):
+            return response
+        if response.is_streamed:
+            encoding = choose_encoding()
+            response.vary.add("Accept-Encoding")
+            if encoding is not None:
+                response.response = _compress_stream(response.response, encoding, app.config)
+                mark_encoded(response, encoding)
+            return response
+
+        size = response.calculate_content_length()
+        if size is None or size < app.config["COMPRESS_MIN_SIZE"]:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(size)
+        if encoding is not None:
+            response.set_data(compress(response.get_data(), encoding))
+            mark_encoded(response, encoding)
+        return response
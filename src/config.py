@@ -0,0 +1,120 @@
+"""
+Environment-driven settings: the app profiles and the database options
+"""
+import os
+from sqlalchemy.pool import NullPool
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+# ENABLE_MIGRATE="auto" registers Flask-Migrate only under the `flask` CLI,
+# the one place `flask db ...` can run; web workers never import Alembic
+PROFILES = {
+    "development": {"ENABLE_ADMIN": True, "ENABLE_OPENAPI": True, "ENABLE_MIGRATE": "auto",
+                    "TEMPLATES_AUTO_RELOAD": True},
+    "production": {"ENABLE_ADMIN": True, "ENABLE_OPENAPI": True, "ENABLE_MIGRATE": "auto"},
+    # API-only instances (e.g. scale-to-zero): no Flask-Admin or flask_swagger
+    # to import at boot
+    "api": {"ENABLE_ADMIN": False, "ENABLE_OPENAPI": False, "ENABLE_MIGRATE": "auto"},
+    "testing": {"TESTING": True, "ENABLE_ADMIN": False, "ENABLE_OPENAPI": False,
+                "ENABLE_MIGRATE": False, "RATELIMIT_ENABLED": False},
+}
+DEFAULT_PROFILE = "production"
+
+
+def profile_config(name=None):
+    """
+    Settings of profile `name` (default: APP_PROFILE), with ENABLE_ADMIN,
+    ENABLE_OPENAPI and ENABLE_MIGRATE from the environment taking precedence.
+    """
+    name = name or os.getenv("APP_PROFILE", DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown APP_PROFILE: {name}")
+    settings = dict(PROFILES[name], APP_PROFILE=name)
+    for key in ("ENABLE_ADMIN", "ENABLE_OPENAPI"):
+        settings[key] = _env_bool(key, settings[key])
+    if os.getenv("ENABLE_MIGRATE") == "auto":
+        settings["ENABLE_MIGRATE"] = "auto"
+    else:
+        settings["ENABLE_MIGRATE"] = _env_bool("ENABLE_MIGRATE", settings["ENABLE_MIGRATE"])
+    return settings
+
+
+def migrate_enabled(setting):
+    if setting == "auto":
+        # Set by flask.cli before it loads the app
+        return os.getenv("FLASK_RUN_FROM_CLI") == "true"
+    return bool(setting)
+
+
+def trusted_proxy_hops():
+    """
+    Reverse proxies in front of the app whose X-Forwarded-For/-Proto entries
+    are trusted (TRUSTED_PROXY_HOPS); 0 trusts none, which is only right when
+    clients connect directly
+    """
+    return _env_int("TRUSTED_PROXY_HOPS", 0)
+
+
+def database_url():
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        return db_url.replace("postgres://", "postgresql://")
+    return "sqlite:////tmp/test.db"
+
+
+def engine_options(db_url):
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS from DB_* variables.
+
+    DB_PGBOUNCER=1 disables client-side pooling (NullPool) for deployments that
+    sit behind PgBouncer; otherwise a QueuePool sized by DB_POOL_SIZE and
+    DB_MAX_OVERFLOW is used per process, i.e. per gunicorn worker.
+    """
+    options = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+    is_postgres = db_url.startswith("postgresql")
+
+    if _env_bool("DB_PGBOUNCER", False):
+        options["poolclass"] = NullPool
+    elif not db_url.startswith("sqlite:///:memory:") and db_url != "sqlite://":
+        options["pool_size"] = _env_int("DB_POOL_SIZE", 5)
+        options["max_overflow"] = _env_int("DB_MAX_OVERFLOW", 10)
+        options["pool_timeout"] = _env_int("DB_POOL_TIMEOUT", 30)
+        options["pool_recycle"] = _env_int("DB_POOL_RECYCLE", 1800)
+
+    if is_postgres:
+        statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+        if statement_timeout:
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={statement_timeout}"}
+        if db_url.startswith(("postgresql://", "postgresql+psycopg2://")):
+            # Batches executemany() calls (UPDATE/DELETE included) on psycopg2
+            options["executemany_mode"] = os.getenv(
+                "DB_EXECUTEMANY_MODE", "values_plus_batch")
+            options["executemany_batch_page_size"] = _env_int(
+                "DB_EXECUTEMANY_PAGE_SIZE", 1000)
+
+    # Rows per multi-row INSERT when the ORM/Core batches an executemany()
+    options["insertmanyvalues_page_size"] = _env_int("DB_EXECUTEMANY_PAGE_SIZE", 1000)
+    return options
+
+
+def pool_status(engine):
+    """Usage of the engine's connection pool in this process"""
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            status[name] = method()
+    return status
@@ -0,0 +1,123 @@
+"""
+JSON providers and row encoders.
+
+JSON_BACKEND (auto | orjson | stdlib) picks the provider: orjson when it is
+installed, the stdlib otherwise. Both write datetimes as HTTP dates, like
+Flask's default provider, so the backend does not change response bodies.
+
+`row_encoder(fields)` returns a function that turns one result tuple (columns
+in `fields` order) into the bytes of a JSON object, so the list endpoints can
+encode SELECTed columns without loading ORM objects or building dicts.
+"""
+import datetime
+import functools
+import json
+import os
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKENDS = ("auto", "orjson", "stdlib")
+
+
+def _default(o):
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return http_date(o)
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    name = "stdlib"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._compact = json.JSONEncoder(
+            ensure_ascii=self.ensure_ascii, separators=(",", ":"), default=_default).encode
+        self._quote = (json.encoder.encode_basestring_ascii if self.ensure_ascii
+                       else json.encoder.encode_basestring)
+
+    def dumps_bytes(self, obj):
+        return self._compact(obj).encode()
+
+    def _value(self, value):
+        if value is None:
+            return "null"
+        if value is True:
+            return "true"
+        if value is False:
+            return "false"
+        if isinstance(value, str):
+            return self._quote(value)
+        if isinstance(value, int):
+            return int.__repr__(value)
+        return self._compact(value)
+
+    @functools.lru_cache(maxsize=64)
+    def row_encoder(self, fields):
+        # Key prefixes are encoded once per projection, not once per row
+        prefixes = [("{" if i == 0 else ",") + self._quote(field) + ":"
+                    for i, field in enumerate(fields)]
+        value = self._value
+
+        def encode(row):
+            return ("".join([prefix + value(v) for prefix, v in zip(prefixes, row)])
+                    + "}").encode()
+        return encode
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    name = "orjson"
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def _options(self, indent=False):
+        options = self.OPTIONS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default,
+                            option=self._options(kwargs.get("indent"))).decode()
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=_default, option=self._options())
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_default,
+                            option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    @functools.lru_cache(maxsize=64)
+    def row_encoder(self, fields):
+        options = self.OPTIONS
+
+        def encode(row):
+            return orjson.dumps(dict(zip(fields, row)), default=_default, option=options)
+        return encode
+
+
+def provider_class(backend):
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"JSON_BACKEND must be one of: {', '.join(JSON_BACKENDS)}")
+    if backend == "orjson" and orjson is None:
+        raise RuntimeError("JSON_BACKEND=orjson requires the orjson package")
+    if backend == "stdlib" or orjson is None:
+        return StdlibJSONProvider
+    return OrjsonProvider
+
+
+def init_json(app):
+    app.config.setdefault("JSON_BACKEND", os.getenv("JSON_BACKEND", "auto"))
+    app.json = provider_class(app.config["JSON_BACKEND"])(app)
+    return app.json
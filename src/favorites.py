@@ -0,0 +1,272 @@
+"""
+Set-based favorites sync: a whole list of people/planet favorites is checked
+with IN queries and applied with one INSERT ... ON CONFLICT DO NOTHING and one
+DELETE per table, inside a single transaction.
+
+People.favorite_count / Planets.favorite_count move in the same transaction
+as the favorite rows, by the ids that were actually inserted or deleted;
+`flask reconcile-favorite-counts` recomputes them from the favorite tables.
+
+The single-favorite endpoints use add_favorite/remove_favorite: one
+INSERT ... SELECT (or DELETE) whose row count says whether anything changed,
+so concurrent identical requests create or delete exactly one row and the
+losers get a clean 409/404 instead of an IntegrityError.
+"""
+import datetime
+import json
+import click
+from flask import jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import DateTime, delete, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from utils import APIException
+from pagination import int_arg
+from models import db, User, People, Planets, Favorite_people, Favorite_planets
+from versions import bump_versions, favorites_version
+from upsert import insert_ignore_from_select, supports_returning
+
+KINDS = {
+    "people": (People, Favorite_people, "people_id"),
+    "planets": (Planets, Favorite_planets, "planet_id")
+}
+
+
+def id_list(payload, key):
+    """Reads an optional list of integer ids from `payload[key]`"""
+    if payload is None:
+        return []
+    if not isinstance(payload, dict):
+        raise APIException("Se esperaba un objeto JSON con listas de ids", 400)
+    values = payload.get(key) or []
+    if not isinstance(values, list) or not all(
+            isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise APIException(f"'{key}' debe ser una lista de ids enteros", 400)
+    return list(dict.fromkeys(values))
+
+
+def _missing_ids(model, ids):
+    if not ids:
+        return []
+    found = set(db.session.execute(
+        select(model.id).where(model.id.in_(ids))).scalars())
+    return [value for value in ids if value not in found]
+
+
+def _current_ids(favorite_model, column, user_id):
+    return set(db.session.execute(
+        select(getattr(favorite_model, column))
+        .where(favorite_model.user_id == user_id)
+    ).scalars())
+
+
+def adjust_favorite_counts(model, ids, delta):
+    """Moves favorite_count of `ids` by `delta` in one UPDATE, in the caller's transaction"""
+    if not ids:
+        return
+    db.session.execute(
+        update(model).where(model.id.in_(ids))
+        .values(favorite_count=model.favorite_count + delta)
+        .execution_options(synchronize_session=False))
+
+
+def _user_exists(user_id):
+    return select(User.id).where(User.id == user_id).exists()
+
+
+def _add(model, favorite_model, column, user_id, ids):
+    if not ids:
+        return []
+    if not supports_returning():
+        # Without RETURNING the counters need to know which rows are new
+        current = _current_ids(favorite_model, column, user_id)
+        ids = [value for value in ids if value not in current]
+        if not ids:
+            return []
+    # INSERT ... SELECT: the EXISTS keeps rows of a missing user out (SQLite
+    # does not enforce the foreign key) without a separate round trip
+    now = datetime.datetime.utcnow()
+    source = select(literal(user_id), model.id, literal(now, DateTime())).where(
+        model.id.in_(ids), _user_exists(user_id))
+    stmt = insert_ignore_from_select(favorite_model, ["user_id", column, "added_date"], source)
+    if supports_returning():
+        return list(db.session.execute(
+            stmt.returning(getattr(favorite_model, column))).scalars())
+    return ids if db.session.execute(stmt).rowcount else []
+
+
+def _remove(favorite_model, column, user_id, ids):
+    if not ids:
+        return []
+    stmt = (
+        delete(favorite_model)
+        .where(favorite_model.user_id == user_id)
+        .where(getattr(favorite_model, column).in_(ids))
+    )
+    if db.engine.dialect.delete_returning:
+        return list(db.session.execute(
+            stmt.returning(getattr(favorite_model, column))).scalars())
+    current = _current_ids(favorite_model, column, user_id)
+    db.session.execute(stmt)
+    return [value for value in ids if value in current]
+
+
+def sync_favorites(user_id, add, remove, replace=False, user_checked=False):
+    """
+    Applies favorite changes for one user. `add`/`remove` map "people" and
+    "planets" to id lists; with `replace` the `add` lists become the full set
+    and anything else is removed. `user_checked` skips the existence query
+    when a token already vouched for the user. Returns the ids actually
+    added and removed.
+    """
+    if not user_checked and db.session.get(User, user_id) is None:
+        raise APIException("No se pudo encontrar ningún usuario", 404)
+
+    missing = {}
+    for kind, (model, _, _) in KINDS.items():
+        ids = _missing_ids(model, add[kind])
+        if ids:
+            missing[kind] = ids
+    if missing:
+        raise APIException("Algunos favoritos no están registrados", 404,
+                           {"missing": missing})
+
+    added = {}
+    removed = {}
+    try:
+        for kind, (model, favorite_model, column) in KINDS.items():
+            to_add = add[kind]
+            to_remove = remove[kind]
+            if replace:
+                current = _current_ids(favorite_model, column, user_id)
+                to_remove = [value for value in current if value not in set(to_add)]
+                to_add = [value for value in to_add if value not in current]
+            removed[kind] = _remove(favorite_model, column, user_id, to_remove)
+            added[kind] = _add(model, favorite_model, column, user_id, to_add)
+            adjust_favorite_counts(model, removed[kind], -1)
+            adjust_favorite_counts(model, added[kind], 1)
+
+        if user_checked and any(add.values()) and not any(added.values()) \
+                and db.session.get(User, user_id) is None:
+            # The token outlived its user (deleted through another worker)
+            raise APIException("No se pudo encontrar ningún usuario", 404)
+        if any(added.values()) or any(removed.values()):
+            bump_versions([favorites_version(user_id)])
+        db.session.commit()
+    except IntegrityError:
+        # The user (or a target) was deleted concurrently; the FK refused it
+        db.session.rollback()
+        raise APIException("No se pudo encontrar ningún usuario", 404)
+    except Exception:
+        db.session.rollback()
+        raise
+    return added, removed
+
+
+def add_favorite(kind, user_id, target_id):
+    """
+    Adds one favorite and commits. The row is inserted by an INSERT ... SELECT
+    that finds nothing when the target or the user does not exist (a token
+    does not prove the user still exists) and skips an existing favorite.
+    Returns the new favorite, or None when nothing was inserted (see
+    missing_reference for why).
+    """
+    model, favorite_model, column = KINDS[kind]
+    now = datetime.datetime.utcnow()
+    source = select(literal(user_id), model.id, literal(now, DateTime())).where(
+        model.id == target_id, _user_exists(user_id))
+    try:
+        result = db.session.execute(insert_ignore_from_select(
+            favorite_model, ["user_id", column, "added_date"], source))
+        if result.rowcount != 1:
+            db.session.rollback()
+            return None
+        adjust_favorite_counts(model, [target_id], 1)
+        bump_versions([favorites_version(user_id)])
+        db.session.commit()
+    except IntegrityError:
+        # A referenced row was deleted between the SELECT and the insert
+        db.session.rollback()
+        return None
+    except Exception:
+        db.session.rollback()
+        raise
+    return favorite_model(user_id=user_id, added_date=now, **{column: target_id})
+
+
+def remove_favorite(kind, user_id, target_id):
+    """Deletes one favorite with a single DELETE and commits; False when there was none"""
+    model, favorite_model, column = KINDS[kind]
+    try:
+        result = db.session.execute(
+            delete(favorite_model)
+            .where(favorite_model.user_id == user_id)
+            .where(getattr(favorite_model, column) == target_id))
+        if result.rowcount != 1:
+            db.session.rollback()
+            return False
+        adjust_favorite_counts(model, [target_id], -1)
+        bump_versions([favorites_version(user_id)])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+
+def missing_reference(kind, user_id, target_id):
+    """
+    Why a favorite write changed nothing: "user" or "target" when that row
+    does not exist, None when the favorite already was (or was not) there
+    """
+    if db.session.get(User, user_id) is None:
+        return "user"
+    if db.session.get(KINDS[kind][0], target_id) is None:
+        return "target"
+    return None
+
+
+TOP_DEFAULT = 10
+TOP_MAX = 100
+
+
+def top_response(model, args, msg, key):
+    """Most favorited rows, read from the (favorite_count, id) index"""
+    limit = min(max(int_arg(args, "limit", TOP_DEFAULT), 1), TOP_MAX)
+    fields = model.SUMMARY_FIELDS + ("favorite_count",)
+    rows = db.session.execute(
+        select(*[getattr(model, field) for field in fields])
+        .where(model.favorite_count > 0)
+        .order_by(model.favorite_count.desc(), model.id.desc())
+        .limit(limit))
+    return jsonify({"msg": msg, key: [dict(zip(fields, row)) for row in rows]}), 200
+
+
+def reconcile_counts():
+    """Rewrites every favorite_count that differs from its favorite table"""
+    fixed = {}
+    try:
+        for model, favorite_model, column in KINDS.values():
+            actual = (select(func.count()).select_from(favorite_model)
+                      .where(getattr(favorite_model, column) == model.id)
+                      .scalar_subquery())
+            result = db.session.execute(
+                update(model).where(model.favorite_count != actual)
+                .values(favorite_count=actual)
+                .execution_options(synchronize_session=False))
+            fixed[model.__tablename__] = result.rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return fixed
+
+
+@click.command("reconcile-favorite-counts")
+@with_appcontext
+def reconcile_command():
+    """Recomputes People/Planets favorite_count from the favorite tables"""
+    click.echo(json.dumps(reconcile_counts()))
+
+
+def init_favorites(app):
+    app.cli.add_command(reconcile_command)
@@ -0,0 +1,112 @@
+"""
+Idempotency keys for the create endpoints.
+
+A client that sends `Idempotency-Key: <unique value>` with a POST can retry
+it safely: the first request claims the key (an atomic set-if-absent), runs
+the view and stores its response for IDEMPOTENCY_TTL seconds; retries with
+the same key are answered from the store without running the view again and
+carry `Idempotent-Replayed: true`. A retry that arrives while the first
+request is still running gets 409, and a key reused for a different request
+(another path or body) gets 422. Server errors (5xx) are not stored, so the
+client can retry them for real.
+
+Keys are scoped per client (the token's user, else the remote address), and
+live in IDEMPOTENCY_BACKEND, which every worker and host must share: redis
+when CACHE_BACKEND is redis, else the shared_entry table, where the claim is
+an INSERT on the key's primary key. "memory" gives each gunicorn worker its
+own store, so a retry routed to another worker would run the POST again;
+it is only right with a single worker.
+"""
+import hashlib
+import json
+import os
+from functools import wraps
+from flask import current_app, request
+from utils import APIException
+from cache import make_backend, shared_backend
+from ratelimit import client_key
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = 86400
+# How long a claimed key blocks retries if its request never finishes
+DEFAULT_LOCK_SECONDS = 60
+PENDING = b"pending"
+
+
+def _fingerprint():
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _dump(fingerprint, response):
+    meta = {"fingerprint": fingerprint, "status": response.status_code,
+            "mimetype": response.mimetype}
+    return json.dumps(meta).encode() + b"\n" + response.get_data()
+
+
+def _load(record):
+    meta, _, body = record.partition(b"\n")
+    return json.loads(meta), body
+
+
+def idempotent(view):
+    """Replays the stored response of a POST retried with the same Idempotency-Key"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise APIException(f"{HEADER} no puede superar {MAX_KEY_LENGTH} caracteres", 400)
+
+        store = get_store()
+        config = current_app.config
+        store_key = f"idempotency:{client_key()}:{key}"
+        fingerprint = _fingerprint()
+        if not store.set(store_key, PENDING, ex=config["IDEMPOTENCY_LOCK_SECONDS"], nx=True):
+            record = store.get(store_key)
+            if record is None or record == PENDING:
+                raise APIException("Una solicitud con esta Idempotency-Key sigue en curso", 409)
+            meta, body = _load(record)
+            if meta["fingerprint"] != fingerprint:
+                raise APIException(
+                    "Esta Idempotency-Key ya se usó con otra solicitud", 422)
+            response = current_app.response_class(
+                body, status=meta["status"], mimetype=meta["mimetype"])
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            store.delete(store_key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            store.delete(store_key)
+        else:
+            store.set(store_key, _dump(fingerprint, response), ex=config["IDEMPOTENCY_TTL"])
+        return response
+    return wrapper
+
+
+def init_idempotency(app):
+    app.config.setdefault("IDEMPOTENCY_TTL", int(os.getenv("IDEMPOTENCY_TTL", DEFAULT_TTL)))
+    app.config.setdefault("IDEMPOTENCY_LOCK_SECONDS", int(
+        os.getenv("IDEMPOTENCY_LOCK_SECONDS", DEFAULT_LOCK_SECONDS)))
+    app.config.setdefault("IDEMPOTENCY_MAX_ENTRIES", int(
+        os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000)))
+
+    app.config.setdefault("IDEMPOTENCY_BACKEND", os.getenv(
+        "IDEMPOTENCY_BACKEND", shared_backend(app.config)))
+
+    store = make_backend(app.config["IDEMPOTENCY_BACKEND"],
+                         app.config.get("CACHE_REDIS_URL"),
+                         app.config["IDEMPOTENCY_MAX_ENTRIES"])
+    app.extensions["idempotency_store"] = store
+    return store
+
+
+def get_store():
+    return current_app.extensions["idempotency_store"]
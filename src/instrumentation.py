@@ -0,0 +1,125 @@
+"""
+Per-request SQL instrumentation.
+
+Hooks the engine's before/after_cursor_execute events to count the queries
+and DB time of each request and keep its slowest statements. The totals go
+out as a `Server-Timing` header and a structured log line; statements slower
+than SLOW_QUERY_MS are logged as SQL text. Their bound parameters (password
+hashes, emails) are only included with SLOW_QUERY_LOG_PARAMS=1, for local
+debugging.
+
+Both go to the "api.instrumentation" logger at INSTRUMENTATION_LOG_LEVEL
+(INFO: every request and the slow queries, WARNING: slow queries only). When
+logging is not configured elsewhere (no root handler), the lines are written
+to stderr, which gunicorn and Render collect.
+"""
+import json
+import logging
+import os
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger("api.instrumentation")
+
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_SLOWEST_KEPT = 3
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    return g.get("sql_stats")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(app, conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+
+    if elapsed_ms >= app.config["SLOW_QUERY_MS"]:
+        if app.config["SLOW_QUERY_LOG_PARAMS"]:
+            logger.warning("slow query %.1fms: %s params=%r", elapsed_ms, statement, parameters)
+        else:
+            logger.warning("slow query %.1fms: %s", elapsed_ms, statement)
+
+    stats = _stats()
+    if stats is None:
+        return
+    stats["count"] += 1
+    stats["time_ms"] += elapsed_ms
+    slowest = stats["slowest"]
+    slowest.append((elapsed_ms, statement))
+    slowest.sort(key=lambda item: item[0], reverse=True)
+    del slowest[app.config["SLOWEST_QUERIES_KEPT"]:]
+
+
+def request_sql_stats():
+    """Query count and DB time of the current request so far, or None outside one"""
+    stats = _stats()
+    if stats is None:
+        return None
+    return {"count": stats["count"], "time_ms": stats["time_ms"]}
+
+
+def _configure_logger(level):
+    logger.setLevel(level)
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def init_instrumentation(app):
+    app.config.setdefault("SLOW_QUERY_MS", float(
+        os.getenv("SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)))
+    app.config.setdefault("SLOW_QUERY_LOG_PARAMS", os.getenv(
+        "SLOW_QUERY_LOG_PARAMS", "0") in ("1", "true", "True"))
+    app.config.setdefault("SLOWEST_QUERIES_KEPT", int(
+        os.getenv("SLOWEST_QUERIES_KEPT", DEFAULT_SLOWEST_KEPT)))
+    app.config.setdefault("SERVER_TIMING", os.getenv(
+        "SERVER_TIMING", "1") not in ("0", "false", "False"))
+    app.config.setdefault("INSTRUMENTATION_LOG_LEVEL", os.getenv(
+        "INSTRUMENTATION_LOG_LEVEL", "INFO").upper())
+    _configure_logger(app.config["INSTRUMENTATION_LOG_LEVEL"])
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute",
+                 lambda *args: _after_cursor_execute(app, *args))
+
+    @app.before_request
+    def start_sql_stats():
+        g.request_started = time.perf_counter()
+        g.sql_stats = {"count": 0, "time_ms": 0.0, "slowest": []}
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.get("sql_stats")
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - g.request_started) * 1000
+
+        if app.config["SERVER_TIMING"]:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats["time_ms"]:.2f};desc="{stats["count"]} queries", '
+                f"app;dur={total_ms:.2f}")
+
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 2),
+            "db_queries": stats["count"],
+            "db_time_ms": round(stats["time_ms"], 2),
+            "slowest": [{"ms": round(ms, 2), "statement": statement}
+                        for ms, statement in stats["slowest"]]
+        }))
+        return response
@@ -0,0 +1,302 @@
+"""
+Prometheus-style metrics served at /metrics in the text exposition format.
+
+Each process keeps its own counters and histograms. With METRICS_MULTIPROC_DIR
+set (one directory shared by all gunicorn workers), a background thread in
+every worker writes a snapshot file there each METRICS_FLUSH_SECONDS and a
+scrape merges all of them: counters and histograms of exited workers are kept
+so totals stay monotonic, gauges only count live workers.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from flask import Response, g, request
+from sqlalchemy import event
+from models import db
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_FLUSH_SECONDS = 1.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests handled, by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "Request latency by route"),
+    "http_response_size_bytes": ("histogram", "Response body size by route"),
+    "db_pool_checkout_wait_seconds": ("histogram", "Time spent waiting for a pooled DB connection"),
+    "db_pool_checked_out": ("gauge", "DB connections currently checked out"),
+    "cache_hits_total": ("counter", "Response cache hits"),
+    "cache_misses_total": ("counter", "Response cache misses"),
+    "cache_hit_ratio": ("gauge", "Response cache hits / lookups"),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, buckets, value, labels=()):
+        key = (name, tuple(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": list(buckets), "counts": [0] * len(buckets),
+                    "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def set_gauge(self, name, value, labels=()):
+        with self._lock:
+            self.gauges[(name, tuple(labels))] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[name, list(labels), value]
+                             for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), dict(h, counts=list(h["counts"]))]
+                               for (name, labels), h in self.histograms.items()],
+                "gauges": [[name, list(labels), value]
+                           for (name, labels), value in self.gauges.items()],
+            }
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    counters, histograms, gauges = {}, {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snap["histograms"]:
+            key = (name, tuple(labels))
+            merged = histograms.setdefault(key, {
+                "buckets": h["buckets"], "counts": [0] * len(h["buckets"]),
+                "sum": 0.0, "count": 0})
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], h["counts"])]
+            merged["sum"] += h["sum"]
+            merged["count"] += h["count"]
+        if snap.get("live", True):
+            for name, labels, value in snap["gauges"]:
+                key = (name, tuple(labels))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+def _format_labels(label_names, labels, extra=None):
+    pairs = list(zip(label_names, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+LABELS = {
+    "http_requests_total": ("route", "method", "status"),
+    "http_request_duration_seconds": ("route", "method"),
+    "http_response_size_bytes": ("route",),
+}
+
+
+def render(counters, histograms, gauges):
+    hits = sum(v for (name, _), v in counters.items() if name == "cache_hits_total")
+    misses = sum(v for (name, _), v in counters.items() if name == "cache_misses_total")
+    gauges[("cache_hit_ratio", ())] = hits / (hits + misses) if hits + misses else 0.0
+
+    lines = []
+    for metric, (kind, help_text) in HELP.items():
+        label_names = LABELS.get(metric, ())
+        if kind == "histogram":
+            series = sorted((k, v) for k, v in histograms.items() if k[0] == metric)
+        elif kind == "counter":
+            series = sorted((k, v) for k, v in counters.items() if k[0] == metric)
+        else:
+            series = sorted((k, v) for k, v in gauges.items() if k[0] == metric)
+        if not series:
+            continue
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (_, labels), value in series:
+            if kind != "histogram":
+                lines.append(f"{metric}{_format_labels(label_names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(value["buckets"], value["counts"]):
+                cumulative += count
+                le = _format_labels(label_names, labels, ("le", bound))
+                lines.append(f"{metric}_bucket{le} {cumulative}")
+            le = _format_labels(label_names, labels, ("le", "+Inf"))
+            lines.append(f"{metric}_bucket{le} {value['count']}")
+            lines.append(f"{metric}_sum{_format_labels(label_names, labels)} {value['sum']}")
+            lines.append(f"{metric}_count{_format_labels(label_names, labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    def __init__(self, app):
+        self.app = app
+        self.directory = app.config["METRICS_MULTIPROC_DIR"]
+        self.flush_seconds = app.config["METRICS_FLUSH_SECONDS"]
+        self._cache_seen = (0, 0)
+        self._collect_lock = threading.Lock()
+        self._flusher_pid = None
+
+    def collect_process_state(self):
+        """Copies values owned by other modules (pool, cache) into the registry"""
+        pool = self._engine.pool
+        if hasattr(pool, "checkedout"):
+            registry.set_gauge("db_pool_checked_out", pool.checkedout())
+        cache = self.app.extensions.get("response_cache")
+        if cache is None:
+            return
+        with self._collect_lock:
+            stats = cache.stats()
+            seen_hits, seen_misses = self._cache_seen
+            registry.inc("cache_hits_total", value=stats["hits"] - seen_hits)
+            registry.inc("cache_misses_total", value=stats["misses"] - seen_misses)
+            self._cache_seen = (stats["hits"], stats["misses"])
+
+    def flush(self):
+        if not self.directory:
+            return
+        self.collect_process_state()
+        path = os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def ensure_flusher(self):
+        """Starts the snapshot thread once per process, i.e. again in each forked worker"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        thread = threading.Thread(target=self._flush_loop, name="metrics-flusher",
+                                  daemon=True)
+        thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def snapshots(self):
+        if not self.directory:
+            self.collect_process_state()
+            return [registry.snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snap["live"] = _pid_alive(snap["pid"])
+            snapshots.append(snap)
+        return snapshots
+
+    def exposition(self):
+        return render(*merge(self.snapshots()))
+
+    def install(self, engine):
+        self._engine = engine
+        self._wrap_pool_connect(engine)
+        event.listen(engine, "engine_disposed",
+                     lambda conn: self._wrap_pool_connect(engine))
+
+    @staticmethod
+    def _wrap_pool_connect(engine):
+        # The pool has no "before checkout" event, so time its public connect()
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                registry.observe("db_pool_checkout_wait_seconds", POOL_WAIT_BUCKETS,
+                                 time.perf_counter() - started)
+        pool.connect = timed_connect
+
+
+def init_metrics(app):
+    app.config.setdefault("METRICS_MULTIPROC_DIR", os.getenv("METRICS_MULTIPROC_DIR"))
+    app.config.setdefault("METRICS_FLUSH_SECONDS", float(
+        os.getenv("METRICS_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS)))
+
+    exporter = MetricsExporter(app)
+    with app.app_context():
+        exporter.install(db.engine)
+    app.extensions["metrics"] = exporter
+    if exporter.directory:
+        os.makedirs(exporter.directory, exist_ok=True)
+        atexit.register(exporter.flush)
+
+    @app.before_request
+    def start_metrics_timer():
+        exporter.ensure_flusher()
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_metrics(response):
+        started = g.get("metrics_started")
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        registry.inc("http_requests_total",
+                     (route, request.method, response.status_code))
+        registry.observe("http_request_duration_seconds", LATENCY_BUCKETS,
+                         time.perf_counter() - started, (route, request.method))
+        size = response.calculate_content_length()
+        if size is not None:
+            registry.observe("http_response_size_bytes", SIZE_BUCKETS, size, (route,))
+        return response
+
+    return exporter
+
+
+def metrics_response(exporter):
+    return Response(exporter.exposition(), content_type=CONTENT_TYPE)
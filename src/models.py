@@ -1,19 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, DateTime, Integer, ForeignKey, Enum
+from sqlalchemy import (String, Boolean, DateTime, Float, Integer, ForeignKey, Enum, Index,
+                        LargeBinary)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import datetime
-from typing import List
+from typing import List, Optional
 
 db = SQLAlchemy()
 
 
 class User(db.Model):
     __tablename__ = "user"
+    __table_args__ = (
+        Index("ix_user_username", "username", unique=True),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     username: Mapped[str] = mapped_column(String(120), nullable=False)
     email: Mapped[str] = mapped_column(
         String(120), unique=True, nullable=False)
-    password: Mapped[str] = mapped_column(nullable=False)
+    # Hash string from passwords.Hasher (scrypt/pbkdf2/argon2), never the password
+    password: Mapped[str] = mapped_column(String(255), nullable=False)
     create_date: Mapped[datetime.datetime] = mapped_column(
         DateTime(), default=datetime.datetime.utcnow)
     is_active: Mapped[bool] = mapped_column(Boolean(), default=True)
@@ -22,18 +27,18 @@ class User(db.Model):
     favorites_planets: Mapped[List["Favorite_planets"]
                               ] = relationship(back_populates="user_rel")
 
+    SUMMARY_FIELDS = ("id", "username", "email", "is_active", "create_date")
+
     def serialize(self):
-        return {
-            "id": self.id,
-            "username": self.username,
-            "email": self.email,
-            "is_active": self.is_active,
-            "create_date": self.create_date
-        }
+        return {field: getattr(self, field) for field in self.SUMMARY_FIELDS}
 
 
 class Favorite_people(db.Model):
     tablename = "favorite_people"
+    # The primary key already covers lookups by user; this one serves "who favorited X"
+    __table_args__ = (
+        Index("ix_favorite_people_people_id", "people_id", "user_id"),
+    )
     """ id: Mapped[int] = mapped_column(primary_key=True) """
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"),  primary_key=True)
     people_id: Mapped[int] = mapped_column(ForeignKey("people.id"),  primary_key=True)
@@ -51,6 +56,9 @@ class Favorite_people(db.Model):
 
 class Favorite_planets(db.Model):
     tablename = "favorite_planets"
+    __table_args__ = (
+        Index("ix_favorite_planets_planet_id", "planet_id", "user_id"),
+    )
     """ id: Mapped[int] = mapped_column(primary_key=True) """
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
     planet_id: Mapped[int] = mapped_column(ForeignKey("planet.id"), primary_key=True)
@@ -69,6 +77,11 @@ class Favorite_planets(db.Model):
 
 class People(db.Model):
     __tablename__ = "people"
+    __table_args__ = (
+        Index("ix_people_name", "name", unique=True),
+        # Serves the /people/top leaderboard, scanned backwards
+        Index("ix_people_favorite_count", "favorite_count", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     height: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -78,21 +91,29 @@ class People(db.Model):
     eye_color: Mapped[str] = mapped_column(String(30), nullable=True)
     birth_year: Mapped[str] = mapped_column(String(30), nullable=True)
     gender: Mapped[str] = mapped_column(String(30), nullable=True)
+    # Number of favorite_people rows, maintained by favorites.adjust_favorite_counts
+    favorite_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0")
     favorited_by: Mapped[List["Favorite_people"]
                          ] = relationship(back_populates="person_rel")
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "height": self.height,
-            "mass": self.mass,
-            "gender": self.gender
-        }
+    SUMMARY_FIELDS = ("id", "name", "height", "mass", "gender")
+    DETAIL_FIELDS = ("id", "name", "height", "mass", "hair_color", "skin_color",
+                     "eye_color", "birth_year", "gender")
+    # Written by the API itself, never by clients or imports
+    DERIVED_FIELDS = ("favorite_count",)
+
+    def serialize(self, fields=None):
+        return {field: getattr(self, field) for field in (fields or self.SUMMARY_FIELDS)}
 
 
 class Planets(db.Model):
     __tablename__ = "planet"
+    __table_args__ = (
+        Index("ix_planet_name", "name", unique=True),
+        # Serves the /planet/top leaderboard, scanned backwards
+        Index("ix_planet_favorite_count", "favorite_count", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     rotation_period: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -103,14 +124,40 @@ class Planets(db.Model):
     terrain: Mapped[str] = mapped_column(String(120), nullable=True)
     surface_water: Mapped[int] = mapped_column(Integer, nullable=True)
     population: Mapped[int] = mapped_column(Integer, nullable=True)
+    # Number of favorite_planets rows, maintained by favorites.adjust_favorite_counts
+    favorite_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0")
     favorited_by: Mapped[List["Favorite_planets"]
                          ] = relationship(back_populates="planet_rel")
 
+    SUMMARY_FIELDS = ("id", "name", "climate", "population", "terrain")
+    DETAIL_FIELDS = ("id", "name", "rotation_period", "orbital_period", "diameter",
+                     "climate", "gravity", "terrain", "surface_water", "population")
+    DERIVED_FIELDS = ("favorite_count",)
+
+    def serialize(self, fields=None):
+        return {field: getattr(self, field) for field in (fields or self.SUMMARY_FIELDS)}
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_version"
+    name: Mapped[str] = mapped_column(String(120), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), nullable=True, default=datetime.datetime.utcnow)
+
     def serialize(self):
         return {
-            "id": self.id,
             "name": self.name,
-            "climate": self.climate,
-            "population": self.population,
-            "terrain": self.terrain
+            "version": self.version,
+            "updated_at": self.updated_at
         }
+
+
+class SharedEntry(db.Model):
+    """Expiring key/value rows every worker and host sees (cache.DatabaseStore)"""
+    __tablename__ = "shared_entry"
+    key: Mapped[str] = mapped_column(String(512), primary_key=True)
+    value: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # time.time() after which the row is ignored and pruned; NULL never expires
+    expires_at: Mapped[Optional[float]] = mapped_column(Float, nullable=True, index=True)
@@ -0,0 +1,118 @@
+"""
+Keyset (cursor) pagination and streaming helpers for the list endpoints.
+
+Rows are SELECTed as plain column tuples and encoded by the app's JSON
+provider (see encoding.py); no ORM objects are built for list responses.
+"""
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+from utils import APIException
+from models import db
+from projection import parse_fields
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+STREAM_MODES = ("ndjson", "json")
+
+
+def int_arg(args, name, default):
+    value = args.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise APIException(f"El parámetro '{name}' debe ser un entero", 400)
+
+
+def parse_page_args(args):
+    """Reads `limit`/`after` from the query string, clamping limit to MAX_PAGE_SIZE"""
+    limit = int_arg(args, "limit", DEFAULT_PAGE_SIZE)
+    after = int_arg(args, "after", None)
+    if limit < 1:
+        raise APIException("El parámetro 'limit' debe ser mayor que 0", 400)
+    return min(limit, MAX_PAGE_SIZE), after
+
+
+def parse_stream_arg(args):
+    mode = args.get("stream")
+    if mode is None or mode == "":
+        return None
+    if mode not in STREAM_MODES:
+        raise APIException(
+            f"El parámetro 'stream' debe ser uno de: {', '.join(STREAM_MODES)}", 400)
+    return mode
+
+
+def _columns(model, fields):
+    return [getattr(model, field) for field in fields]
+
+
+def keyset_page(model, limit, after=None, fields=None):
+    """
+    Returns (rows, next_cursor) ordered by id, rows being tuples of `fields`.
+    One extra row is fetched to know whether there is a next page without
+    running a COUNT(*)
+    """
+    fields = fields or model.SUMMARY_FIELDS
+    stmt = select(*_columns(model, fields)).order_by(model.id).limit(limit + 1)
+    if after is not None:
+        stmt = stmt.where(model.id > after)
+    rows = db.session.execute(stmt).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][fields.index("id")]
+    return rows, None
+
+
+def iter_rows(model, batch_size=STREAM_BATCH_SIZE, fields=None):
+    """Iterates the whole table in id order, buffering only `batch_size` rows at a time"""
+    stmt = select(*_columns(model, fields or model.SUMMARY_FIELDS)).order_by(
+        model.id).execution_options(yield_per=batch_size)
+    yield from db.session.execute(stmt)
+
+
+def stream_response(model, mode, msg, key, fields=None):
+    """
+    Streams every row of `model` either as NDJSON (one object per line) or as a
+    chunked JSON document shaped like the paginated response
+    """
+    provider = current_app.json
+    encode = provider.row_encoder(fields or model.SUMMARY_FIELDS)
+
+    def generate_ndjson():
+        for row in iter_rows(model, fields=fields):
+            yield encode(row) + b"\n"
+
+    def generate_json():
+        yield b'{"msg":' + provider.dumps_bytes(msg) + b',"' + key.encode() + b'":['
+        first = True
+        for row in iter_rows(model, fields=fields):
+            yield encode(row) if first else b"," + encode(row)
+            first = False
+        yield b'],"next_cursor":null}'
+
+    if mode == "ndjson":
+        return Response(stream_with_context(generate_ndjson()),
+                        mimetype="application/x-ndjson")
+    return Response(stream_with_context(generate_json()),
+                    mimetype="application/json")
+
+
+def list_response(model, args, msg, key):
+    """Shared body for the list endpoints: a keyset page or, on demand, a stream"""
+    mode = parse_stream_arg(args)
+    fields = parse_fields(model, args)
+    if mode is not None:
+        return stream_response(model, mode, msg, key, fields)
+
+    limit, after = parse_page_args(args)
+    rows, next_cursor = keyset_page(model, limit, after, fields)
+    provider = current_app.json
+    encode = provider.row_encoder(fields or model.SUMMARY_FIELDS)
+    body = b"".join([
+        b'{"msg":', provider.dumps_bytes(msg),
+        b',"', key.encode(), b'":[', b",".join([encode(row) for row in rows]),
+        b'],"next_cursor":', provider.dumps_bytes(next_cursor), b"}\n"])
+    return current_app.response_class(body, mimetype="application/json"), 200
@@ -0,0 +1,141 @@
+"""
+Password hashing off the request hot path.
+
+PASSWORD_HASH_METHOD picks the scheme and its cost:
+- a Werkzeug method string, e.g. "scrypt:32768:8:1" (default) or
+  "pbkdf2:sha256:600000"
+- "argon2", tuned by ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and
+  ARGON2_PARALLELISM (needs the argon2-cffi package)
+
+Hashing and verification run in a per-process pool of PASSWORD_HASH_THREADS
+threads (gevent's native thread pool when threading is monkey-patched, so
+the event loop keeps serving other requests). At most PASSWORD_HASH_QUEUE
+jobs wait for it; past that, or after PASSWORD_HASH_TIMEOUT seconds, the
+request fails with 503 instead of piling up. Stored hashes made with other
+parameters, and legacy plain-text passwords, are rehashed on the next
+successful login.
+"""
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from utils import APIException
+
+DEFAULT_METHOD = "scrypt:32768:8:1"
+WERKZEUG_PREFIXES = ("scrypt:", "pbkdf2:")
+
+
+def _gevent_threadpool():
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return None
+    if not monkey.is_module_patched("threading"):
+        return None
+    return get_hub().threadpool
+
+
+class Hasher:
+    def __init__(self, method=DEFAULT_METHOD, threads=2, queue=32, timeout=10.0,
+                 argon2_params=None):
+        self.method = method
+        self.threads = threads
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(threads + queue)
+        self._executor = None
+        self._pid = None
+        self._argon2 = None
+        self._dummy = None
+        if method == "argon2":
+            # Optional dependency, only needed when argon2 is configured
+            from argon2 import PasswordHasher
+            self._argon2 = PasswordHasher(**(argon2_params or {}))
+
+    # -- the CPU-bound primitives, run inside the pool --------------------
+
+    def _hash(self, password):
+        if self._argon2 is not None:
+            return self._argon2.hash(password)
+        return generate_password_hash(password, method=self.method)
+
+    def _verify(self, stored, password):
+        if stored.startswith("$argon2"):
+            from argon2 import PasswordHasher
+            from argon2.exceptions import InvalidHashError, VerificationError
+            try:
+                return (self._argon2 or PasswordHasher()).verify(stored, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        if stored.startswith(WERKZEUG_PREFIXES):
+            return check_password_hash(stored, password)
+        # Rows written before hashing existed hold the password itself
+        return hmac.compare_digest(stored.encode(), password.encode())
+
+    def needs_rehash(self, stored):
+        if self._argon2 is not None:
+            return not stored.startswith("$argon2") or self._argon2.check_needs_rehash(stored)
+        return stored.split("$", 1)[0] != self.method
+
+    # -- pool ---------------------------------------------------------------
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise APIException("Servidor ocupado, inténtalo de nuevo", 503)
+        try:
+            gevent_pool = _gevent_threadpool()
+            if gevent_pool is not None:
+                return gevent_pool.apply(fn, args)
+            if self._pid != os.getpid():
+                # A pool inherited through fork has no threads behind it
+                self._executor = ThreadPoolExecutor(
+                    self.threads, thread_name_prefix="password-hash")
+                self._pid = os.getpid()
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise APIException("Servidor ocupado, inténtalo de nuevo", 503)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def verify(self, stored, password):
+        """Returns (valid, new_hash); new_hash is set when the stored one is outdated"""
+        def verify_and_upgrade():
+            if not self._verify(stored, password):
+                return False, None
+            if self.needs_rehash(stored):
+                return True, self._hash(password)
+            return True, None
+        return self._run(verify_and_upgrade)
+
+    def dummy_verify(self, password):
+        """Spends the same time as a real check, for logins of unknown users"""
+        if self._dummy is None:
+            self._dummy = self.hash(os.urandom(16).hex())
+        self.verify(self._dummy, password)
+
+
+def init_passwords(app):
+    app.config.setdefault("PASSWORD_HASH_METHOD", os.getenv("PASSWORD_HASH_METHOD", DEFAULT_METHOD))
+    app.config.setdefault("PASSWORD_HASH_THREADS", int(os.getenv("PASSWORD_HASH_THREADS", 2)))
+    app.config.setdefault("PASSWORD_HASH_QUEUE", int(os.getenv("PASSWORD_HASH_QUEUE", 32)))
+    app.config.setdefault("PASSWORD_HASH_TIMEOUT", float(os.getenv("PASSWORD_HASH_TIMEOUT", 10)))
+    argon2_params = {
+        "time_cost": int(os.getenv("ARGON2_TIME_COST", 3)),
+        "memory_cost": int(os.getenv("ARGON2_MEMORY_COST", 65536)),
+        "parallelism": int(os.getenv("ARGON2_PARALLELISM", 4)),
+    }
+    app.config.setdefault("ARGON2_PARAMS", argon2_params)
+
+    hasher = Hasher(app.config["PASSWORD_HASH_METHOD"], app.config["PASSWORD_HASH_THREADS"],
+                    app.config["PASSWORD_HASH_QUEUE"], app.config["PASSWORD_HASH_TIMEOUT"],
+                    app.config["ARGON2_PARAMS"])
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_hasher():
+    return current_app.extensions["password_hasher"]
@@ -0,0 +1,40 @@
+"""
+Sparse fieldsets for the catalog endpoints.
+
+`?fields=id,name` selects only those columns (plus id) and serializes only
+them; `?expand=detail` returns every column. Models opt in by declaring
+SUMMARY_FIELDS (the default projection) and DETAIL_FIELDS.
+"""
+from sqlalchemy.orm import load_only
+from utils import APIException
+
+
+def parse_fields(model, args):
+    """Returns the tuple of fields to load and serialize for this request"""
+    if not hasattr(model, "DETAIL_FIELDS"):
+        return None
+    requested = args.get("fields")
+    expand = args.get("expand")
+    if expand not in (None, "", "detail"):
+        raise APIException("El parámetro 'expand' solo admite 'detail'", 400)
+
+    if requested:
+        fields = [field.strip() for field in requested.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in model.DETAIL_FIELDS]
+        if unknown:
+            raise APIException(
+                f"Campos desconocidos: {', '.join(unknown)}", 400,
+                {"allowed": list(model.DETAIL_FIELDS)})
+        if "id" not in fields:
+            fields.insert(0, "id")
+        return tuple(dict.fromkeys(fields))
+    if expand == "detail":
+        return model.DETAIL_FIELDS
+    return model.SUMMARY_FIELDS
+
+
+def load_fields(model, fields):
+    """ORM option that restricts the SELECT to `fields`"""
+    if fields is None:
+        return []
+    return [load_only(*[getattr(model, field) for field in fields], raiseload=True)]
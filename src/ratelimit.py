@@ -0,0 +1,260 @@
+"""
+Per-client token-bucket rate limiting, applied in a before_request hook.
+
+Every client (the token's user when a valid bearer token is sent, else the
+remote address) owns a bucket of RATELIMIT_CAPACITY tokens refilled at
+RATELIMIT_REFILL_PER_SECOND. A request spends its route's cost: 1 by default,
+more for list routes (see `request_cost` on the views), multiplied by
+RATELIMIT_STREAM_FACTOR for ?stream= requests. RATELIMIT_COSTS overrides
+costs per endpoint, e.g. "people_list=10,search_catalog=3"; a cost of 0
+exempts the route.
+
+Buckets live in RATELIMIT_BACKEND:
+- memory: per process, so each gunicorn worker limits on its own
+- sqlite: a file (RATELIMIT_SQLITE_PATH) shared by the workers of one host
+- redis: RATELIMIT_REDIS_URL (or CACHE_REDIS_URL), shared by every host
+
+Responses carry RateLimit-Limit/Remaining/Reset and RateLimit-Policy;
+rejected requests get 429 with Retry-After.
+
+Anonymous clients are keyed by request.remote_addr. Behind a reverse proxy
+(Render's router) that is the proxy for everyone, so such deployments set
+TRUSTED_PROXY_HOPS to the number of proxies in front of the app.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from flask import g, request
+from utils import APIException
+from tokens import get_signer
+
+DEFAULT_CAPACITY = 120
+DEFAULT_REFILL = 2.0
+# Relative prices: a list page scans up to MAX_PAGE_SIZE rows, a password
+# hash burns tens of milliseconds of CPU, a bulk import writes whole chunks
+LIST_COST = 5
+HASH_COST = 5
+BULK_COST = 20
+EXEMPT_ENDPOINTS = ("static", "metrics", "health")
+
+
+def request_cost(cost):
+    """Marks a view with the number of tokens a request to it spends"""
+    def decorator(view):
+        view.request_cost = cost
+        return view
+    return decorator
+
+
+def _refill(tokens, stamp, now, capacity, rate):
+    return min(capacity, tokens + max(now - stamp, 0) * rate)
+
+
+class MemoryBuckets:
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, stamp, now, capacity, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now, capacity, rate)
+        return allowed, tokens
+
+    def _prune(self, now, capacity, rate):
+        # A bucket that has refilled completely is the same as no bucket
+        for key, (tokens, stamp) in list(self._buckets.items()):
+            if _refill(tokens, stamp, now, capacity, rate) >= capacity:
+                del self._buckets[key]
+
+
+class SQLiteBuckets:
+    # Every PRUNE_EVERY takes of a process, buckets that have refilled
+    # completely (the same as no bucket) are deleted
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_bucket "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, cost, capacity, rate):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, stamp FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*(row or (capacity, now)), now, capacity, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute("INSERT INTO rate_bucket (key, tokens, stamp) VALUES (?, ?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                         "stamp = excluded.stamp", (key, tokens, now))
+            if self._should_prune():
+                conn.execute("DELETE FROM rate_bucket WHERE tokens + (? - stamp) * ? >= ?",
+                             (now, rate, capacity))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def _should_prune(self):
+        with self._lock:
+            self._takes += 1
+            return self._takes % self.PRUNE_EVERY == 0
+
+
+TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens, stamp = tonumber(bucket[1]), tonumber(bucket[2])
+if tokens == nil then tokens = capacity; stamp = now end
+tokens = math.min(capacity, tokens + math.max(now - stamp, 0) * rate)
+local allowed = 0
+if tokens >= cost then tokens = tokens - cost; allowed = 1 end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBuckets:
+    def __init__(self, url):
+        # Optional dependency, only needed when a Redis server is configured
+        import redis
+        self._take = redis.Redis.from_url(url).register_script(TAKE_SCRIPT)
+
+    def take(self, key, cost, capacity, rate):
+        allowed, tokens = self._take(
+            keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time(), cost])
+        return bool(allowed), float(tokens)
+
+
+def make_buckets(name, config):
+    if name == "memory":
+        return MemoryBuckets()
+    if name == "sqlite":
+        return SQLiteBuckets(config["RATELIMIT_SQLITE_PATH"])
+    if name == "redis":
+        return RedisBuckets(config["RATELIMIT_REDIS_URL"] or config.get("CACHE_REDIS_URL"))
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+def _parse_costs(value):
+    costs = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            endpoint, cost = item.split("=", 1)
+            costs[endpoint.strip()] = int(cost)
+    return costs
+
+
+def client_key():
+    """The token's user when the request has a valid token, else the remote address"""
+    if request.headers.get("Authorization"):
+        try:
+            claims = get_signer().decode(request.headers["Authorization"].partition(" ")[2])
+            return f"user:{claims['sub']}"
+        except APIException:
+            pass
+    # Behind a proxy remote_addr is the proxy's, unless TRUSTED_PROXY_HOPS
+    # makes ProxyFix (see create_app) take it from X-Forwarded-For
+    return f"ip:{request.remote_addr}"
+
+
+def route_cost(app):
+    endpoint = request.endpoint
+    if endpoint is None:
+        return 0
+    # Costs are configured by view name, without the blueprint prefix
+    name = endpoint.rpartition(".")[2]
+    if name in EXEMPT_ENDPOINTS:
+        return 0
+    overrides = app.config["RATELIMIT_COSTS"]
+    if name in overrides:
+        cost = overrides[name]
+    else:
+        view = app.view_functions.get(endpoint)
+        cost = getattr(view, "request_cost", app.config["RATELIMIT_DEFAULT_COST"])
+    if request.args.get("stream"):
+        cost *= app.config["RATELIMIT_STREAM_FACTOR"]
+    return min(cost, app.config["RATELIMIT_CAPACITY"])
+
+
+def init_ratelimit(app):
+    app.config.setdefault("RATELIMIT_ENABLED", os.getenv(
+        "RATELIMIT_ENABLED", "1") not in ("0", "false", "False"))
+    app.config.setdefault("RATELIMIT_BACKEND", os.getenv("RATELIMIT_BACKEND", "memory"))
+    app.config.setdefault("RATELIMIT_SQLITE_PATH", os.getenv(
+        "RATELIMIT_SQLITE_PATH", "/tmp/ratelimit.db"))
+    app.config.setdefault("RATELIMIT_REDIS_URL", os.getenv("RATELIMIT_REDIS_URL"))
+    app.config.setdefault("RATELIMIT_CAPACITY", int(
+        os.getenv("RATELIMIT_CAPACITY", DEFAULT_CAPACITY)))
+    app.config.setdefault("RATELIMIT_REFILL_PER_SECOND", float(
+        os.getenv("RATELIMIT_REFILL_PER_SECOND", DEFAULT_REFILL)))
+    app.config.setdefault("RATELIMIT_DEFAULT_COST", int(os.getenv("RATELIMIT_DEFAULT_COST", 1)))
+    app.config.setdefault("RATELIMIT_STREAM_FACTOR", int(
+        os.getenv("RATELIMIT_STREAM_FACTOR", 10)))
+    app.config.setdefault("RATELIMIT_COSTS", _parse_costs(os.getenv("RATELIMIT_COSTS")))
+
+    buckets = make_buckets(app.config["RATELIMIT_BACKEND"], app.config)
+    app.extensions["rate_limiter"] = buckets
+
+    @app.before_request
+    def take_tokens():
+        if not app.config["RATELIMIT_ENABLED"] or request.method == "OPTIONS":
+            return
+        cost = route_cost(app)
+        if not cost:
+            return
+        capacity = app.config["RATELIMIT_CAPACITY"]
+        rate = app.config["RATELIMIT_REFILL_PER_SECOND"]
+        allowed, tokens = buckets.take(client_key(), cost, capacity, rate)
+        g.rate_limit = (cost, tokens, allowed)
+        if not allowed:
+            raise APIException("Demasiadas solicitudes, inténtalo más tarde", 429)
+
+    @app.after_request
+    def add_rate_limit_headers(response):
+        state = g.get("rate_limit")
+        if state is None:
+            return response
+        cost, tokens, allowed = state
+        capacity = app.config["RATELIMIT_CAPACITY"]
+        rate = app.config["RATELIMIT_REFILL_PER_SECOND"]
+        response.headers["RateLimit-Limit"] = str(capacity)
+        response.headers["RateLimit-Remaining"] = str(int(tokens))
+        response.headers["RateLimit-Reset"] = str(math.ceil((capacity - tokens) / rate))
+        response.headers["RateLimit-Policy"] = f"{capacity};w={math.ceil(capacity / rate)}"
+        if not allowed:
+            response.headers["Retry-After"] = str(math.ceil((cost - tokens) / rate))
+        return response
+
+    return buckets
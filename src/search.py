@@ -0,0 +1,346 @@
+"""
+Full-text and faceted search over People and Planets.
+
+Three backends share one interface, `search(table, terms, filters, limit, offset)`
+returning (rows, total) ranked best first, and `match_clause(table, terms)`
+returning an index-backed WHERE clause (used by the admin list search). All
+three match the same way: a row matches when every term is the prefix of
+one of its words, so "luk" finds Luke Skywalker on any database.
+
+- postgres: `to_tsvector` document matched with a `to_tsquery` of `term:*`
+  prefixes and ranked with `ts_rank`; the same expression is covered by a
+  GIN index (migration)
+- fts5: SQLite FTS5 external-content tables kept in sync by triggers (migration)
+- memory: an inverted index per table held in the process, for SQLite builds
+  without the FTS tables. ORM writes update it incrementally; when the
+  table's version stamp moved because of a write made elsewhere, it is rebuilt
+"""
+import bisect
+import os
+import re
+import threading
+from flask import current_app, jsonify
+from sqlalchemy import and_, column, event, func, inspect, or_, select, table, text
+from flask_sqlalchemy.session import Session
+from utils import APIException
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, int_arg
+from projection import parse_fields
+from models import db, People, Planets, TableVersion
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+# Most ids the memory backend sends in one IN (...): SQLite caps bound
+# parameters (999 before 3.32) and long lists are slow to parse anywhere
+MAX_IN_IDS = 500
+
+SEARCH_TABLES = {
+    "people": (People, ("name", "gender", "eye_color", "hair_color", "skin_color", "birth_year")),
+    "planet": (Planets, ("name", "climate", "terrain", "gravity")),
+}
+
+# Equality facets (case-insensitive) and numeric ranges accepted per type
+FACETS = {
+    "people": {"equals": ("gender", "eye_color", "hair_color"), "ranges": ()},
+    "planet": {"equals": (), "contains": ("climate", "terrain"), "ranges": ("population",)},
+}
+
+
+def tokenize(value):
+    return TOKEN.findall(str(value).lower()) if value is not None else []
+
+
+def document_sql(table_name):
+    """SQL expression of the searchable document; must match the GIN index"""
+    fields = SEARCH_TABLES[table_name][1]
+    joined = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+    return f"to_tsvector('simple', {joined})"
+
+
+def parse_filters(table_name, args):
+    facets = FACETS[table_name]
+    filters = []
+    model = SEARCH_TABLES[table_name][0]
+    for name in facets.get("equals", ()):
+        value = args.get(name)
+        if value:
+            filters.append(func.lower(getattr(model, name)) == value.lower())
+    for name in facets.get("contains", ()):
+        value = args.get(name)
+        if value:
+            filters.append(getattr(model, name).ilike(f"%{value}%"))
+    for name in facets.get("ranges", ()):
+        for suffix, compare in (("min", "__ge__"), ("max", "__le__")):
+            value = args.get(f"{name}_{suffix}")
+            if value in (None, ""):
+                continue
+            try:
+                bound = int(value)
+            except ValueError:
+                raise APIException(f"El parámetro '{name}_{suffix}' debe ser un entero", 400)
+            filters.append(getattr(getattr(model, name), compare)(bound))
+    return filters
+
+
+def prefix_tsquery(terms):
+    """to_tsquery input matching every term as a word prefix; tokens are \\w+, so no escaping"""
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _count(stmt):
+    return db.session.execute(
+        select(func.count()).select_from(stmt.order_by(None).subquery())).scalar_one()
+
+
+class PostgresSearch:
+    name = "postgres"
+
+    def match_clause(self, table_name, terms):
+        """WHERE clause selecting the rows that match every term, via the GIN index"""
+        return text(f"{document_sql(table_name)} @@ to_tsquery('simple', :q)").bindparams(
+            q=prefix_tsquery(terms))
+
+    def search(self, table_name, terms, filters, limit, offset):
+        model = SEARCH_TABLES[table_name][0]
+        stmt = select(model).where(*filters)
+        if terms:
+            document = document_sql(table_name)
+            query = prefix_tsquery(terms)
+            stmt = stmt.where(self.match_clause(table_name, terms)).order_by(
+                text(f"ts_rank({document}, to_tsquery('simple', :q)) DESC")
+                .bindparams(q=query),
+                model.id)
+        else:
+            stmt = stmt.order_by(model.id)
+        total = _count(stmt)
+        rows = db.session.execute(stmt.limit(limit).offset(offset)).scalars().all()
+        return rows, total
+
+
+class Fts5Search:
+    name = "fts5"
+
+    @staticmethod
+    def _match(terms):
+        # Quoted prefix terms: user input never reaches the FTS5 query syntax
+        return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+    def match_clause(self, table_name, terms):
+        model = SEARCH_TABLES[table_name][0]
+        fts_name = f"{table_name}_fts"
+        return model.id.in_(
+            select(column("rowid")).select_from(table(fts_name))
+            .where(text(f"{fts_name} MATCH :match").bindparams(match=self._match(terms))))
+
+    def search(self, table_name, terms, filters, limit, offset):
+        model = SEARCH_TABLES[table_name][0]
+        stmt = select(model).where(*filters)
+        if terms:
+            fts_name = f"{table_name}_fts"
+            fts = table(fts_name, column("rowid"))
+            match = self._match(terms)
+            stmt = (stmt.join(fts, fts.c.rowid == model.id)
+                    .where(text(f"{fts_name} MATCH :match").bindparams(match=match))
+                    .order_by(text(f"bm25({fts_name})"), model.id))
+        else:
+            stmt = stmt.order_by(model.id)
+        total = _count(stmt)
+        rows = db.session.execute(stmt.limit(limit).offset(offset)).scalars().all()
+        return rows, total
+
+
+class MemorySearch:
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {}
+
+    def _current_version(self, table_name):
+        version = db.session.execute(
+            select(TableVersion.version).where(TableVersion.name == table_name)
+        ).scalar_one_or_none()
+        return version or 0
+
+    def _build(self, table_name):
+        model, fields = SEARCH_TABLES[table_name]
+        version = self._current_version(table_name)
+        postings = {}
+        documents = {}
+        columns = [model.id] + [getattr(model, field) for field in fields]
+        stmt = select(*columns).execution_options(yield_per=1000)
+        for row in db.session.execute(stmt):
+            documents[row[0]] = self._document(fields, row[1:])
+            for token in documents[row[0]]["tokens"]:
+                postings.setdefault(token, set()).add(row[0])
+        self._indexes[table_name] = {
+            "version": version, "postings": postings, "documents": documents,
+            "vocabulary": None}
+
+    @staticmethod
+    def _document(fields, values):
+        tokens = set()
+        for value in values:
+            tokens.update(tokenize(value))
+        return {"tokens": tokens, "name": set(tokenize(values[fields.index("name")]))}
+
+    def _index(self, table_name):
+        with self._lock:
+            index = self._indexes.get(table_name)
+            if index is None or index["version"] != self._current_version(table_name):
+                self._build(table_name)
+            return self._indexes[table_name]
+
+    def clear(self):
+        """Drops every index, for a process that moves to another database (tests)"""
+        with self._lock:
+            self._indexes.clear()
+
+    def apply(self, table_name, upserts, deletes, version_steps):
+        """Incremental update from this process's own writes"""
+        with self._lock:
+            index = self._indexes.get(table_name)
+            if index is None:
+                return
+            fields = SEARCH_TABLES[table_name][1]
+            for row_id in list(deletes) + [row_id for row_id, _ in upserts]:
+                old = index["documents"].pop(row_id, None)
+                if old:
+                    for token in old["tokens"]:
+                        index["postings"].get(token, set()).discard(row_id)
+            for row_id, values in upserts:
+                document = self._document(fields, values)
+                index["documents"][row_id] = document
+                for token in document["tokens"]:
+                    index["postings"].setdefault(token, set()).add(row_id)
+            # Rebuilt by the next search that needs it
+            index["vocabulary"] = None
+            index["version"] += version_steps
+
+    @staticmethod
+    def _prefixed(vocabulary, term):
+        """Tokens of the sorted vocabulary that start with term"""
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + "\uffff", start)
+        return vocabulary[start:end]
+
+    def _candidates(self, index, terms):
+        if index["vocabulary"] is None:
+            index["vocabulary"] = sorted(index["postings"])
+        candidates = None
+        for term in terms:
+            ids = set()
+            for token in self._prefixed(index["vocabulary"], term):
+                ids |= index["postings"][token]
+            candidates = ids if candidates is None else candidates & ids
+        return candidates or set()
+
+    @staticmethod
+    def _name_hits(document, terms):
+        return sum(1 for term in terms
+                   if any(token.startswith(term) for token in document["name"]))
+
+    def match_clause(self, table_name, terms):
+        model = SEARCH_TABLES[table_name][0]
+        index = self._index(table_name)
+        with self._lock:
+            candidates = sorted(self._candidates(index, terms))
+        if len(candidates) <= MAX_IN_IDS:
+            return model.id.in_(candidates)
+        # Too many ids for one statement: every term as a substring of some
+        # field, a scan that may also match inside longer words
+        fields = SEARCH_TABLES[table_name][1]
+        return and_(*[or_(*[func.lower(getattr(model, field)).contains(term, autoescape=True)
+                            for field in fields]) for term in terms])
+
+    def search(self, table_name, terms, filters, limit, offset):
+        model = SEARCH_TABLES[table_name][0]
+        if not terms:
+            stmt = select(model).where(*filters).order_by(model.id)
+            total = _count(stmt)
+            return db.session.execute(stmt.limit(limit).offset(offset)).scalars().all(), total
+
+        index = self._index(table_name)
+        with self._lock:
+            candidates = self._candidates(index, terms)
+            # Rank: query terms found in the name first, then id order
+            ranked = sorted(candidates, key=lambda row_id: (
+                -self._name_hits(index["documents"][row_id], terms), row_id))
+        if filters and ranked:
+            allowed = set()
+            for start in range(0, len(ranked), MAX_IN_IDS):
+                allowed.update(db.session.execute(select(model.id).where(
+                    model.id.in_(ranked[start:start + MAX_IN_IDS]), *filters)).scalars())
+            ranked = [row_id for row_id in ranked if row_id in allowed]
+        page_ids = ranked[offset:offset + limit]
+        rows = {row.id: row for row in db.session.execute(
+            select(model).where(model.id.in_(page_ids))).scalars()} if page_ids else {}
+        return [rows[row_id] for row_id in page_ids if row_id in rows], len(ranked)
+
+
+memory_search = MemorySearch()
+_backends = {}
+
+
+def backend_for(app_config):
+    """Chooses the backend once per process from SEARCH_BACKEND and the schema"""
+    choice = app_config.get("SEARCH_BACKEND") or os.getenv("SEARCH_BACKEND", "auto")
+    if choice in _backends:
+        return _backends[choice]
+    backend = None
+    if choice == "postgres" or (choice == "auto" and db.engine.dialect.name == "postgresql"):
+        backend = PostgresSearch()
+    elif choice == "fts5" or (choice == "auto" and db.engine.dialect.name == "sqlite"
+                              and inspect(db.engine).has_table("people_fts")):
+        backend = Fts5Search()
+    else:
+        backend = memory_search
+    _backends[choice] = backend
+    return backend
+
+
+@event.listens_for(Session, "after_flush")
+def _update_memory_index(session, flush_context):
+    changes = {}
+    dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in list(session.new) + dirty:
+        for table_name, (model, fields) in SEARCH_TABLES.items():
+            if isinstance(obj, model):
+                changes.setdefault(table_name, ([], []))[0].append(
+                    (obj.id, [getattr(obj, field) for field in fields]))
+    for obj in session.deleted:
+        for table_name, (model, _) in SEARCH_TABLES.items():
+            if isinstance(obj, model):
+                changes.setdefault(table_name, ([], []))[1].append(obj.id)
+    # versions.bump_versions steps each touched table once per flush
+    for table_name, (upserts, deletes) in changes.items():
+        memory_search.apply(table_name, upserts, deletes, 1)
+
+
+def index_inserted(table_name, rows_by_id):
+    """Lets core INSERT paths (bulk import) feed the memory index"""
+    fields = SEARCH_TABLES[table_name][1]
+    upserts = [(row_id, [row.get(field) for field in fields])
+               for row_id, row in rows_by_id.items()]
+    memory_search.apply(table_name, upserts, [], 1)
+
+
+def search_response(args):
+    table_name = args.get("type", "people")
+    if table_name not in SEARCH_TABLES:
+        raise APIException("El parámetro 'type' debe ser 'people' o 'planet'", 400)
+    limit = min(max(int_arg(args, "limit", DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    offset = max(int_arg(args, "offset", 0), 0)
+
+    fields = parse_fields(SEARCH_TABLES[table_name][0], args)
+    terms = tokenize(args.get("q", ""))
+    filters = parse_filters(table_name, args)
+    backend = backend_for(current_app.config)
+    rows, total = backend.search(table_name, terms, filters, limit, offset)
+
+    response_body = {
+        "msg": "Resultados de la búsqueda",
+        "type": table_name,
+        "total": total,
+        "results": [row.serialize(fields) for row in rows],
+        "next_offset": offset + limit if offset + limit < total else None
+    }
+    return jsonify(response_body), 200
@@ -0,0 +1,161 @@
+"""
+Stateless bearer tokens (JWT, HS256) issued by POST /login.
+
+The payload carries the user id (`sub`), `active`, `iat`, `exp` and a `jti`,
+so a request with a valid token for the user in the URL needs no query to
+prove that the user exists. Logging out stores the token's jti, and deleting
+or deactivating a user stores a "revoked before" timestamp, in a store every
+worker reads (TOKEN_REVOCATION_BACKEND: redis when CACHE_BACKEND is redis,
+else the shared_entry table) whose entries expire once the tokens they cover
+have expired anyway. "memory" keeps them per process and is only right with
+a single worker.
+
+TOKEN_SECRET signs the tokens and TOKEN_TTL is their lifetime in seconds.
+It is required except in the development and testing profiles: anyone who
+knows a default key could mint a token for any user id.
+With TOKEN_REQUIRED=1 the favorites endpoints reject requests without one;
+otherwise they fall back to checking the user in the database.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+from flask import current_app, request
+from utils import APIException
+from cache import make_backend, shared_backend
+
+DEFAULT_TTL = 3600
+# Only these profiles may run with the built-in signing key
+INSECURE_PROFILES = ("development", "testing")
+DEVELOPMENT_SECRET = "development key"
+HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+class TokenSigner:
+    def __init__(self, secret, ttl=DEFAULT_TTL, revocations=None):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.revocations = revocations
+        self._header = _b64encode(json.dumps(HEADER, separators=(",", ":")).encode())
+
+    def _signature(self, signing_input):
+        return _b64encode(hmac.new(self.secret, signing_input, hashlib.sha256).digest())
+
+    def issue(self, user):
+        now = time.time()
+        claims = {
+            "sub": str(user.id),
+            "active": bool(user.is_active),
+            "iat": round(now, 3),
+            "exp": int(now + self.ttl),
+            "jti": uuid.uuid4().hex,
+        }
+        signing_input = self._header + b"." + _b64encode(
+            json.dumps(claims, separators=(",", ":")).encode())
+        return (signing_input + b"." + self._signature(signing_input)).decode()
+
+    def decode(self, token):
+        """Returns the claims of a valid, unexpired, unrevoked token, else raises 401"""
+        try:
+            signing_input, signature = token.encode().rsplit(b".", 1)
+            header, payload = signing_input.split(b".")
+            if not hmac.compare_digest(signature, self._signature(signing_input)):
+                raise ValueError("bad signature")
+            if json.loads(_b64decode(header)) != HEADER:
+                raise ValueError("unsupported header")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, TypeError):
+            raise APIException("Token inválido", 401)
+        if claims.get("exp", 0) <= time.time():
+            raise APIException("Token expirado", 401)
+        if self.is_revoked(claims):
+            raise APIException("Token revocado", 401)
+        return claims
+
+    # -- revocation ---------------------------------------------------------
+
+    def is_revoked(self, claims):
+        if self.revocations is None:
+            return False
+        if self.revocations.get(f"revoked:jti:{claims['jti']}") is not None:
+            return True
+        revoked_before = self.revocations.get(f"revoked:user:{claims['sub']}")
+        return revoked_before is not None and claims["iat"] <= float(revoked_before)
+
+    def revoke(self, claims):
+        remaining = int(claims["exp"] - time.time()) + 1
+        if remaining > 0:
+            self.revocations.set(f"revoked:jti:{claims['jti']}", b"1", ex=remaining)
+
+    def revoke_user(self, user_id):
+        """Invalidates every token of `user_id` issued until now"""
+        self.revocations.set(f"revoked:user:{user_id}", str(time.time()).encode(),
+                             ex=self.ttl + 1)
+
+
+def init_tokens(app):
+    app.config.setdefault("TOKEN_SECRET", os.getenv("TOKEN_SECRET"))
+    if not app.config["TOKEN_SECRET"]:
+        if app.config.get("APP_PROFILE") not in INSECURE_PROFILES:
+            raise RuntimeError(
+                "TOKEN_SECRET is not set; set it (or APP_PROFILE=development) to start")
+        app.config["TOKEN_SECRET"] = DEVELOPMENT_SECRET
+    app.config.setdefault("TOKEN_TTL", int(os.getenv("TOKEN_TTL", DEFAULT_TTL)))
+    app.config.setdefault("TOKEN_REQUIRED", os.getenv(
+        "TOKEN_REQUIRED", "0") in ("1", "true", "True"))
+    app.config.setdefault("TOKEN_REVOCATION_MAX_ENTRIES", int(
+        os.getenv("TOKEN_REVOCATION_MAX_ENTRIES", 100000)))
+
+    app.config.setdefault("TOKEN_REVOCATION_BACKEND", os.getenv(
+        "TOKEN_REVOCATION_BACKEND", shared_backend(app.config)))
+
+    revocations = make_backend(app.config["TOKEN_REVOCATION_BACKEND"],
+                               app.config.get("CACHE_REDIS_URL"),
+                               app.config["TOKEN_REVOCATION_MAX_ENTRIES"])
+    signer = TokenSigner(app.config["TOKEN_SECRET"], app.config["TOKEN_TTL"], revocations)
+    app.extensions["token_signer"] = signer
+    return signer
+
+
+def get_signer():
+    return current_app.extensions["token_signer"]
+
+
+def bearer_claims():
+    """Claims of the request's bearer token, or None when it sent no token"""
+    header = request.headers.get("Authorization", "")
+    if not header:
+        return None
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise APIException("Cabecera Authorization inválida", 401)
+    return get_signer().decode(token.strip())
+
+
+def authorize(user_id):
+    """
+    True when the request carries a valid token for `user_id`, so the caller
+    can skip checking that the user exists; False when no token was sent and
+    tokens are optional. Raises 401/403 otherwise.
+    """
+    claims = bearer_claims()
+    if claims is None:
+        if current_app.config["TOKEN_REQUIRED"]:
+            raise APIException("Se requiere un token", 401)
+        return False
+    if claims["sub"] != str(user_id):
+        raise APIException("El token no pertenece a este usuario", 403)
+    if not claims.get("active"):
+        raise APIException("Usuario inactivo", 403)
+    return True
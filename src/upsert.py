@@ -0,0 +1,107 @@
+"""
+Dialect-aware INSERT helpers
+"""
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from models import db
+
+MYSQL = ("mysql", "mariadb")
+# Error codes of a unique or primary key violation
+UNIQUE_VIOLATIONS = {"23505", 1062}
+
+
+def _insert(model):
+    dialect = db.engine.dialect.name
+    # Dialect packages are imported here so the app only loads the one it uses
+    if dialect == "postgresql":
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects import sqlite
+        return sqlite.insert(model)
+    if dialect in MYSQL:
+        from sqlalchemy.dialects import mysql
+        return mysql.insert(model)
+    return insert(model)
+
+
+def _ignore_conflicts(model, stmt):
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        return stmt.on_conflict_do_nothing()
+    if hasattr(stmt, "on_duplicate_key_update"):
+        # A no-op update instead of IGNORE, which would also turn NOT NULL
+        # and truncation errors into warnings and store the coerced row
+        key = model.__table__.primary_key.columns[0]
+        return stmt.on_duplicate_key_update({key.name: key})
+    return stmt
+
+
+def insert_ignore(model, rows):
+    """
+    Builds a multi-row INSERT that skips rows hitting a unique or primary key
+    conflict: ON CONFLICT DO NOTHING on PostgreSQL/SQLite, ON DUPLICATE KEY
+    UPDATE id=id on MySQL
+    """
+    return _ignore_conflicts(model, _insert(model).values(rows))
+
+
+def insert_ignore_from_select(model, columns, select):
+    """
+    INSERT ... SELECT counterpart of insert_ignore; the SELECT can filter rows
+    out. MySQL gets INSERT IGNORE here: every value comes from rows already
+    stored, and SQLAlchemy's FOUND_ROWS flag makes ON DUPLICATE KEY UPDATE
+    count a skipped duplicate as an affected row.
+    """
+    stmt = _insert(model).from_select(columns, select)
+    if db.engine.dialect.name in MYSQL:
+        return stmt.prefix_with("IGNORE")
+    return _ignore_conflicts(model, stmt)
+
+
+def insert_or_update(model, values, key):
+    """
+    Builds a one-row INSERT that overwrites the row with the same `key`
+    columns: ON CONFLICT DO UPDATE on PostgreSQL/SQLite, ON DUPLICATE KEY
+    UPDATE on MySQL. Other dialects get a plain INSERT.
+    """
+    stmt = _insert(model).values(values)
+    changes = {name: value for name, value in values.items() if name not in key}
+    if hasattr(stmt, "on_conflict_do_update"):
+        return stmt.on_conflict_do_update(index_elements=list(key), set_=changes)
+    if hasattr(stmt, "on_duplicate_key_update"):
+        return stmt.on_duplicate_key_update(changes)
+    return stmt
+
+
+def is_unique_violation(error):
+    """Whether an IntegrityError comes from a unique or primary key, not a NOT NULL or FK"""
+    orig = error.orig
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    if code is None and getattr(orig, "args", None):
+        code = orig.args[0]
+    return code in UNIQUE_VIOLATIONS or "UNIQUE constraint failed" in str(orig)
+
+
+def insert_unique(model, values):
+    """
+    Inserts one row in one statement unless it conflicts with a unique key.
+    Returns the new row's id, or None when the row already existed; any
+    other constraint failure is raised.
+    """
+    stmt = insert_ignore(model, [values])
+    try:
+        if supports_returning():
+            return db.session.execute(stmt.returning(model.id)).scalar_one_or_none()
+        result = db.session.execute(stmt)
+    except IntegrityError as error:
+        # Dialects without a conflict clause report it as an error
+        db.session.rollback()
+        if is_unique_violation(error):
+            return None
+        raise
+    # MySQL counts the duplicate-key branch as a row but generates no id there
+    return result.lastrowid if result.rowcount == 1 and result.lastrowid else None
+
+
+def supports_returning():
+    return db.engine.dialect.insert_returning
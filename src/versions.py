@@ -0,0 +1,113 @@
+"""
+Version stamps for conditional GETs.
+
+Every write to a catalog table, the user table or a user's favorites bumps a
+row in `table_version` inside the same transaction. Read endpoints build their
+ETag/Last-Modified from those rows, so a client revalidating its copy gets a
+304 after one primary-key lookup on that table and no rows are loaded.
+"""
+import datetime
+import zlib
+from functools import wraps
+from flask import Response, current_app, g, request
+from sqlalchemy import event, insert, select, update
+from flask_sqlalchemy.session import Session
+from models import db, User, People, Planets, Favorite_people, Favorite_planets, TableVersion
+
+
+def favorites_version(user_id):
+    return f"favorites:{user_id}"
+
+
+def _version_names(obj):
+    if isinstance(obj, People):
+        return ["people"]
+    if isinstance(obj, Planets):
+        return ["planet"]
+    if isinstance(obj, User):
+        return ["user"]
+    if isinstance(obj, (Favorite_people, Favorite_planets)):
+        return [favorites_version(obj.user_id)]
+    return []
+
+
+def bump_versions(names, connection=None):
+    """Increments each named version in the current transaction, creating missing rows"""
+    connection = connection or db.session.connection()
+    now = datetime.datetime.utcnow()
+    for name in sorted(set(names)):
+        result = connection.execute(
+            update(TableVersion)
+            .where(TableVersion.name == name)
+            .values(version=TableVersion.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(TableVersion).values(name=name, version=1, updated_at=now))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    names = []
+    dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in list(session.new) + dirty + list(session.deleted):
+        names.extend(_version_names(obj))
+    if names:
+        bump_versions(names, session.connection())
+
+
+def current_stamp(names):
+    """Returns (etag, last_modified) for the given version names in one query"""
+    rows = {
+        row.name: row for row in db.session.execute(
+            select(TableVersion).where(TableVersion.name.in_(names))
+        ).scalars()
+    }
+    parts = []
+    last_modified = None
+    for name in names:
+        row = rows.get(name)
+        parts.append(str(row.version if row else 0))
+        if row and row.updated_at and (last_modified is None or row.updated_at > last_modified):
+            last_modified = row.updated_at
+    parts.append(format(zlib.crc32(request.query_string), "x"))
+    if last_modified is not None:
+        last_modified = last_modified.replace(
+            microsecond=0, tzinfo=datetime.timezone.utc)
+    return "-".join(parts), last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    ims = request.if_modified_since
+    return ims is not None and last_modified is not None and last_modified <= ims
+
+
+def conditional_view(names):
+    """
+    Answers If-None-Match / If-Modified-Since from version stamps before the
+    view runs. `names` is a list of version names or a callable receiving the
+    view arguments and returning one.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version_names = names(**kwargs) if callable(names) else names
+            etag, last_modified = current_stamp(version_names)
+            # cache.cached_view keys its entries on the same stamp
+            g.version_stamp = etag
+
+            if _not_modified(etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,29 @@
+"""
+Shared fixtures. The app modules live in src/ and import each other by bare
+name (`from models import db`), so src/ goes on sys.path like under gunicorn's
+--chdir.
+"""
+import os
+import sys
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The testing profile on a fresh SQLite file (shared by threads, unlike :memory:)"""
+    from app import create_app
+    from models import db
+    from search import memory_search
+    # The in-memory search index belongs to the process, not to a database
+    memory_search.clear()
+    app = create_app("testing", SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+                     INSTRUMENTATION_LOG_LEVEL="WARNING")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,96 @@
+"""
+Identical write requests released at once must behave like one request.
+
+For each create endpoint (person, planet, favorite person, favorite planet)
+and the favorite deletes, `clients` threads fire the same request through a
+barrier. Exactly one must succeed, the others must get 409 (404 for a
+delete) and never a 500, exactly one row must exist afterwards and
+favorite_count must match the favorite rows. benchmarks.concurrency runs the
+same races at a larger scale.
+"""
+import collections
+import threading
+from sqlalchemy import func, select
+
+
+def fire(app, clients, method, path, json=None):
+    barrier = threading.Barrier(clients)
+    statuses = []
+    lock = threading.Lock()
+
+    def client():
+        http = app.test_client()
+        barrier.wait()
+        try:
+            status = http.open(path, method=method, json=json).status_code
+        except Exception:
+            # TESTING propagates view errors instead of answering 500
+            status = 500
+        with lock:
+            statuses.append(status)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return collections.Counter(statuses)
+
+
+def check(name, statuses, success, loser, rows, expected_rows, failures):
+    clients = sum(statuses.values())
+    ok = statuses[success] == 1 and statuses[loser] == clients - 1 and rows == expected_rows
+    if not ok:
+        failures.append(f"{name}: statuses {dict(statuses)}, {rows} rows")
+    return ok
+
+
+def run_races(app, clients, rounds):
+    """Runs every race `rounds` times as user 1 and returns the failures found"""
+    from models import db, People, Planets, Favorite_people, Favorite_planets
+
+    def count(stmt):
+        with app.app_context():
+            return db.session.execute(stmt).scalar()
+
+    failures = []
+    for n in range(rounds):
+        for kind, model, path in (("people", People, "/people"), ("planet", Planets, "/planets")):
+            name = f"race-{kind}-{n}"
+            statuses = fire(app, clients, "POST", path, {"name": name})
+            rows = count(select(func.count()).select_from(model).where(model.name == name))
+            check(f"POST {path} #{n}", statuses, 201, 409, rows, 1, failures)
+
+        with app.app_context():
+            person_id = db.session.execute(
+                select(People.id).where(People.name == f"race-people-{n}")).scalar()
+            planet_id = db.session.execute(
+                select(Planets.id).where(Planets.name == f"race-planet-{n}")).scalar()
+        for model, favorite_model, column, path in (
+                (People, Favorite_people, "people_id", f"/1/favoritePeople/{person_id}"),
+                (Planets, Favorite_planets, "planet_id", f"/1/favoritePlanet/{planet_id}")):
+            target_id = person_id if model is People else planet_id
+            rows_stmt = select(func.count()).select_from(favorite_model).where(
+                getattr(favorite_model, column) == target_id)
+            counter_stmt = select(model.favorite_count).where(model.id == target_id)
+
+            statuses = fire(app, clients, "POST", path)
+            rows = count(rows_stmt)
+            check(f"POST {path}", statuses, 201, 409, rows, 1, failures)
+            if count(counter_stmt) != rows:
+                failures.append(f"POST {path}: favorite_count {count(counter_stmt)} != {rows}")
+
+            statuses = fire(app, clients, "DELETE", path)
+            rows = count(rows_stmt)
+            check(f"DELETE {path}", statuses, 200, 404, rows, 0, failures)
+            if count(counter_stmt) != rows:
+                failures.append(f"DELETE {path}: favorite_count {count(counter_stmt)} != {rows}")
+    return failures
+
+
+def test_concurrent_identical_writes(app):
+    from models import db, User
+    with app.app_context():
+        db.session.add(User(username="racer", email="racer@example.com", password="x"))
+        db.session.commit()
+    assert run_races(app, clients=8, rounds=3) == []
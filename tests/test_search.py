@@ -0,0 +1,34 @@
+"""
+Every backend matches each term as a word prefix (FTS5 `"term"*`, Postgres
+`term:*`); the in-memory index, used here on SQLite without FTS tables, must
+agree.
+"""
+import pytest
+
+
+@pytest.fixture
+def client(app):
+    from models import db, People
+    app.config["SEARCH_BACKEND"] = "memory"
+    with app.app_context():
+        db.session.add_all([People(name=name, favorite_count=0) for name in (
+            "Luke Skywalker", "Lukas Jr", "Leia Organa", "Anakin Skywalker")])
+        db.session.commit()
+    return app.test_client()
+
+
+def names(client, query):
+    response = client.get(f"/search?{query}")
+    assert response.status_code == 200
+    return sorted(row["name"] for row in response.get_json()["results"])
+
+
+def test_terms_match_word_prefixes(client):
+    assert names(client, "q=luk") == ["Lukas Jr", "Luke Skywalker"]
+    assert names(client, "q=sky+luk") == ["Luke Skywalker"]
+    assert names(client, "q=walker") == []
+
+
+def test_new_rows_match_by_prefix(client):
+    assert client.post("/people", json={"name": "Lukewarm"}).status_code == 201
+    assert names(client, "q=lukew") == ["Lukewarm"]